@@ -8,13 +8,14 @@ import json
 import os
 import time
 import hashlib
-from typing import Optional, Dict, Any, List, Tuple
+import threading
+from typing import Optional, Dict, Any, List, Tuple, Iterator
 import logging
 
 # Try to import MySQL connector
 try:
     import mysql.connector
-    from mysql.connector import Error
+    from mysql.connector import Error, pooling
     MYSQL_AVAILABLE = True
 except ImportError:
     MYSQL_AVAILABLE = False
@@ -33,11 +34,16 @@ DB_CONFIG = {
     'sql_mode': 'TRADITIONAL'
 }
 
+# Pooled connections used by the execute_* methods (mysql-connector caps pools at 32)
+POOL_SIZE = min(32, max(2, 2 * (os.cpu_count() or 1)))
+
 class DatabaseManager:
     """Manages database connections and operations with JSON fallback"""
     
     def __init__(self):
         self.connection = None
+        self.pool = None
+        self._pool_slots = threading.BoundedSemaphore(POOL_SIZE)  # Blocks callers instead of PoolError when exhausted
         self.is_connected = False
         self.fallback_to_json = False
         self.logger = self._setup_logger()
@@ -113,6 +119,8 @@ class DatabaseManager:
                     
                     # Create tables if they don't exist
                     self._create_tables_if_not_exist()
+                    
+                    self._create_pool()
                 else:
                     self.logger.error("Failed to connect to specific database")
                     self.fallback_to_json = True
@@ -146,10 +154,12 @@ class DatabaseManager:
                 CREATE TABLE IF NOT EXISTS users (
                     id INT AUTO_INCREMENT PRIMARY KEY,
                     username VARCHAR(50) UNIQUE NOT NULL,
+                    username_lower VARCHAR(50) AS (LOWER(username)) STORED,
                     email VARCHAR(100) UNIQUE NOT NULL,
-                    password_hash VARCHAR(64) NOT NULL,
+                    password_hash VARCHAR(255) NOT NULL,
                     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+                    INDEX idx_username_lower (username_lower)
                 )
             """)
             
@@ -181,7 +191,8 @@ class DatabaseManager:
                     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
                     INDEX idx_username (username),
                     INDEX idx_token (token),
-                    INDEX idx_expiry (expiry)
+                    INDEX idx_expiry (expiry),
+                    INDEX idx_verified_expiry (verified, expiry)
                 )
             """)
             
@@ -234,11 +245,100 @@ class DatabaseManager:
             else:
                 self.logger.info("✅ reset_tokens table already has updated_at column")
             
+            # Check if verification_tokens has the (verified, expiry) index used by cleanup
+            cursor.execute("""
+                SELECT INDEX_NAME 
+                FROM INFORMATION_SCHEMA.STATISTICS 
+                WHERE TABLE_SCHEMA = %s 
+                AND TABLE_NAME = 'verification_tokens' 
+                AND INDEX_NAME = 'idx_verified_expiry'
+            """, (DB_CONFIG['database'],))
+            
+            if not cursor.fetchone():
+                self.logger.info("Adding idx_verified_expiry index to verification_tokens table...")
+                cursor.execute("""
+                    ALTER TABLE verification_tokens 
+                    ADD INDEX idx_verified_expiry (verified, expiry)
+                """)
+                self.logger.info("✅ Added idx_verified_expiry index to verification_tokens table")
+            else:
+                self.logger.info("✅ verification_tokens table already has idx_verified_expiry index")
+            
+            # Check if users has the indexed lowercase username used by case-insensitive login
+            cursor.execute("""
+                SELECT COLUMN_NAME 
+                FROM INFORMATION_SCHEMA.COLUMNS 
+                WHERE TABLE_SCHEMA = %s 
+                AND TABLE_NAME = 'users' 
+                AND COLUMN_NAME = 'username_lower'
+            """, (DB_CONFIG['database'],))
+            
+            if not cursor.fetchone():
+                self.logger.info("Adding username_lower column to users table...")
+                cursor.execute("""
+                    ALTER TABLE users 
+                    ADD COLUMN username_lower VARCHAR(50) AS (LOWER(username)) STORED,
+                    ADD INDEX idx_username_lower (username_lower)
+                """)
+                self.logger.info("✅ Added username_lower column to users table")
+            else:
+                self.logger.info("✅ users table already has username_lower column")
+            
+            # Check if users.password_hash is wide enough for Argon2/scrypt hashes
+            cursor.execute("""
+                SELECT CHARACTER_MAXIMUM_LENGTH 
+                FROM INFORMATION_SCHEMA.COLUMNS 
+                WHERE TABLE_SCHEMA = %s 
+                AND TABLE_NAME = 'users' 
+                AND COLUMN_NAME = 'password_hash'
+            """, (DB_CONFIG['database'],))
+            
+            row = cursor.fetchone()
+            if row and row[0] < 255:
+                self.logger.info("Widening users.password_hash to VARCHAR(255)...")
+                cursor.execute("ALTER TABLE users MODIFY COLUMN password_hash VARCHAR(255) NOT NULL")
+                self.logger.info("✅ Widened users.password_hash")
+            else:
+                self.logger.info("✅ users.password_hash is already wide enough")
+            
             cursor.close()
             
         except Error as e:
             self.logger.error(f"Error updating schema: {e}")
     
+    def _create_pool(self):
+        """Create the connection pool used for queries; the single connection remains a fallback"""
+        if self.pool is not None:
+            return
+        try:
+            self.pool = pooling.MySQLConnectionPool(
+                pool_name="zachapp", pool_size=POOL_SIZE, pool_reset_session=False, **DB_CONFIG
+            )
+            self.logger.info(f"Database connection pool ready ({POOL_SIZE} connections)")
+        except Error as e:
+            self.logger.error(f"Error creating connection pool: {e}")
+            self.pool = None
+    
+    def _checkout_connection(self):
+        """Borrow a pooled connection, or the shared connection if there is no pool"""
+        if self.pool is None:
+            return self.get_connection()
+        
+        self._pool_slots.acquire()
+        try:
+            return self.pool.get_connection()
+        except Error as e:
+            self._pool_slots.release()
+            self.logger.warning(f"Connection pool unavailable, using shared connection: {e}")
+            return self.get_connection()
+    
+    def _checkin_connection(self, connection):
+        """Return a connection obtained from _checkout_connection()"""
+        if connection is None or connection is self.connection:
+            return
+        connection.close()  # Hands a pooled connection back to the pool
+        self._pool_slots.release()
+    
     def get_connection(self):
         """Get database connection"""
         if self.is_connected and self.connection and self.connection.is_connected():
@@ -254,7 +354,7 @@ class DatabaseManager:
             self.logger.warning("Database not available, using JSON fallback")
             return None
         
-        connection = self.get_connection()
+        connection = self._checkout_connection()
         if not connection:
             self.logger.error("No database connection available")
             return None
@@ -276,12 +376,178 @@ class DatabaseManager:
         finally:
             if 'cursor' in locals():
                 cursor.close()
+            self._checkin_connection(connection)
+    
+    def iter_query(self, query: str, params: Tuple = None, batch_size: int = 1000) -> Iterator[Dict]:
+        """Stream the rows of a SELECT without buffering the whole result set
+        
+        Rows are fetched from an unbuffered cursor batch_size at a time. The
+        connection stays checked out until the generator is exhausted or closed.
+        """
+        if self.fallback_to_json:
+            self.logger.warning("Database not available, using JSON fallback")
+            return
+        
+        connection = self._checkout_connection()
+        if not connection:
+            self.logger.error("No database connection available")
+            return
+        
+        try:
+            cursor = connection.cursor(dictionary=True, buffered=False)
+            cursor.execute(query, params)
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield from rows
+        except Error as e:
+            self.logger.error(f"Database query error: {e}")
+        finally:
+            if 'cursor' in locals():
+                try:
+                    cursor.close()  # Drains any unread rows so the connection is reusable
+                except Error:
+                    pass
+            self._checkin_connection(connection)
+    
+    def execute_update(self, query: str, params: Tuple = None) -> Optional[int]:
+        """Execute an UPDATE/DELETE and return the number of affected rows (None on error)"""
+        if self.fallback_to_json:
+            self.logger.warning("Database not available, using JSON fallback")
+            return None
+        
+        connection = self._checkout_connection()
+        if not connection:
+            self.logger.error("No database connection available")
+            return None
+        
+        try:
+            cursor = connection.cursor()
+            cursor.execute(query, params)
+            connection.commit()
+            return cursor.rowcount
+        except Error as e:
+            self.logger.error(f"Database query error: {e}")
+            return None
+        finally:
+            if 'cursor' in locals():
+                cursor.close()
+            self._checkin_connection(connection)
+    
+    def execute_many(self, query: str, params_seq: List[Tuple]) -> Optional[int]:
+        """Execute one statement for every params tuple in a single commit; returns affected rows (None on error)
+        
+        mysql-connector rewrites INSERT ... VALUES executemany calls into one multi-row INSERT.
+        """
+        if self.fallback_to_json:
+            self.logger.warning("Database not available, using JSON fallback")
+            return None
+        
+        connection = self._checkout_connection()
+        if not connection:
+            self.logger.error("No database connection available")
+            return None
+        
+        try:
+            cursor = connection.cursor()
+            cursor.executemany(query, params_seq)
+            connection.commit()
+            return cursor.rowcount
+        except Error as e:
+            self.logger.error(f"Database executemany error: {e}")
+            try:
+                connection.rollback()
+            except Error:
+                pass
+            return None
+        finally:
+            if 'cursor' in locals():
+                cursor.close()
+            self._checkin_connection(connection)
+    
+    def execute_batched_delete(self, query: str, params: Tuple = None, batch_size: int = 10000) -> int:
+        """Run a DELETE ... LIMIT %s repeatedly until no rows are left; returns total rows deleted
+        
+        The query must end with LIMIT %s; batch_size is appended to params.
+        Deleting in batches keeps each statement's write locks short.
+        """
+        if self.fallback_to_json:
+            self.logger.warning("Database not available, using JSON fallback")
+            return 0
+        
+        connection = self._checkout_connection()
+        if not connection:
+            self.logger.error("No database connection available")
+            return 0
+        
+        total = 0
+        try:
+            cursor = connection.cursor()
+            while True:
+                cursor.execute(query, tuple(params or ()) + (batch_size,))
+                connection.commit()
+                total += cursor.rowcount
+                if cursor.rowcount < batch_size:
+                    break
+            return total
+        except Error as e:
+            self.logger.error(f"Database batched delete error: {e}")
+            return total
+        finally:
+            if 'cursor' in locals():
+                cursor.close()
+            self._checkin_connection(connection)
+    
+    def consume_reset_token(self, token: str) -> Optional[Dict]:
+        """Atomically fetch and delete an unexpired reset token; returns the row or None
+        
+        The row is locked with SELECT ... FOR UPDATE and deleted in the same
+        transaction, so a token can only ever be consumed once.
+        """
+        if self.fallback_to_json:
+            self.logger.warning("Database not available, using JSON fallback")
+            return None
+        
+        connection = self._checkout_connection()
+        if not connection:
+            self.logger.error("No database connection available")
+            return None
+        
+        try:
+            # Connections run in autocommit mode; the row lock must outlive the SELECT
+            connection.start_transaction()
+            cursor = connection.cursor(dictionary=True)
+            cursor.execute("""
+                SELECT id, username, email, UNIX_TIMESTAMP(expiry) as expiry_timestamp
+                FROM reset_tokens
+                WHERE token = %s AND expiry > NOW()
+                FOR UPDATE
+            """, (token,))
+            row = cursor.fetchone()
+            if row:
+                cursor.execute("DELETE FROM reset_tokens WHERE id = %s", (row["id"],))
+            connection.commit()
+            return row
+        except Error as e:
+            self.logger.error(f"Database reset token consume error: {e}")
+            try:
+                connection.rollback()
+            except Error:
+                pass
+            return None
+        finally:
+            if 'cursor' in locals():
+                cursor.close()
+            self._checkin_connection(connection)
     
     def close_connection(self):
         """Close database connection"""
         if self.connection and self.connection.is_connected():
             self.connection.close()
             self.logger.info("Database connection closed")
+        # Idle pooled connections are closed when the pool is garbage collected
+        self.pool = None
     
     def is_database_available(self) -> bool:
         """Check if database is available"""
@@ -303,24 +569,49 @@ def execute_database_query(query: str, params: Tuple = None, fetch: bool = False
     """Execute database query"""
     return db_manager.execute_query(query, params, fetch)
 
+def iter_database_query(query: str, params: Tuple = None, batch_size: int = 1000) -> Iterator[Dict]:
+    """Stream the rows of a SELECT"""
+    return db_manager.iter_query(query, params, batch_size)
+
+def execute_update(query: str, params: Tuple = None) -> Optional[int]:
+    """Execute an UPDATE/DELETE and return the number of affected rows"""
+    return db_manager.execute_update(query, params)
+
+def execute_many(query: str, params_seq: List[Tuple]) -> Optional[int]:
+    """Execute one statement for many params tuples in a single commit"""
+    return db_manager.execute_many(query, params_seq)
+
+def execute_batched_delete(query: str, params: Tuple = None, batch_size: int = 10000) -> int:
+    """Execute a batched DELETE ... LIMIT %s query"""
+    return db_manager.execute_batched_delete(query, params, batch_size)
+
 # User management functions
+SAVE_USER_QUERY = """
+    INSERT INTO users (username, email, password_hash) 
+    VALUES (%s, %s, %s)
+    ON DUPLICATE KEY UPDATE 
+    email = VALUES(email), 
+    password_hash = VALUES(password_hash),
+    updated_at = CURRENT_TIMESTAMP
+"""
+
 def save_user_to_db(username: str, email: str, password_hash: str) -> bool:
     """Save user to database"""
     if not is_database_available():
         return False
     
-    query = """
-        INSERT INTO users (username, email, password_hash) 
-        VALUES (%s, %s, %s)
-        ON DUPLICATE KEY UPDATE 
-        email = VALUES(email), 
-        password_hash = VALUES(password_hash),
-        updated_at = CURRENT_TIMESTAMP
-    """
-    
-    result = execute_database_query(query, (username, email, password_hash))
+    result = execute_database_query(SAVE_USER_QUERY, (username, email, password_hash))
     return result is not None
 
+def save_users_to_db_bulk(users: List[Tuple[str, str, str]]) -> bool:
+    """Save many (username, email, password_hash) rows in one statement"""
+    if not is_database_available():
+        return False
+    if not users:
+        return True
+    
+    return execute_many(SAVE_USER_QUERY, users) is not None
+
 def get_user_from_db(username: str) -> Optional[Dict]:
     """Get user from database"""
     if not is_database_available():
@@ -369,6 +660,30 @@ def get_session_from_db(username: str, token: str) -> Optional[Dict]:
     result = execute_database_query(query, (username, token), fetch=True)
     return result[0] if result else None
 
+def extend_session_in_db(username: str, token: str, expiry: int, min_step: int = 0) -> bool:
+    """Slide a live session's expiry forward in one statement; False if missing or expired
+    
+    The row is only rewritten when the new expiry is more than min_step
+    seconds past the stored one.
+    """
+    if not is_database_available():
+        return False
+    
+    query = """
+        UPDATE sessions 
+        SET expiry = FROM_UNIXTIME(%s), updated_at = CURRENT_TIMESTAMP 
+        WHERE username = %s AND token = %s AND expiry > NOW() AND expiry < FROM_UNIXTIME(%s)
+    """
+    rows = execute_update(query, (expiry, username, token, expiry - min_step))
+    if rows is None:
+        return False
+    if rows:
+        return True
+    
+    # Nothing was rewritten either because the session is missing/expired or
+    # because its expiry is already within min_step; confirm it is still live
+    return get_session_from_db(username, token) is not None
+
 def delete_session_from_db(username: str, token: str = None) -> bool:
     """Delete session from database"""
     if not is_database_available():
@@ -385,24 +700,37 @@ def delete_session_from_db(username: str, token: str = None) -> bool:
     return result is not None
 
 # Verification token functions
+SAVE_VERIFICATION_TOKEN_QUERY = """
+    INSERT INTO verification_tokens (username, email, token, expiry) 
+    VALUES (%s, %s, %s, FROM_UNIXTIME(%s))
+    ON DUPLICATE KEY UPDATE 
+    token = VALUES(token),
+    expiry = VALUES(expiry),
+    verified = FALSE,
+    updated_at = CURRENT_TIMESTAMP
+"""
+
 def save_verification_token_to_db(username: str, email: str, token: str, expiry: int) -> bool:
     """Save verification token to database"""
     if not is_database_available():
         return False
     
-    query = """
-        INSERT INTO verification_tokens (username, email, token, expiry) 
-        VALUES (%s, %s, %s, FROM_UNIXTIME(%s))
-        ON DUPLICATE KEY UPDATE 
-        token = VALUES(token),
-        expiry = VALUES(expiry),
-        verified = FALSE,
-        updated_at = CURRENT_TIMESTAMP
-    """
-    
-    result = execute_database_query(query, (username, email, token, expiry))
+    result = execute_database_query(SAVE_VERIFICATION_TOKEN_QUERY, (username, email, token, expiry))
     return result is not None
 
+def save_verification_tokens_to_db_bulk(tokens: List[Tuple[str, str, str, int]]) -> bool:
+    """Save many (username, email, token, expiry) rows in one statement"""
+    if not is_database_available():
+        return False
+    if not tokens:
+        return True
+    
+    return execute_many(SAVE_VERIFICATION_TOKEN_QUERY, tokens) is not None
+
+def _verification_token_keys(token: str) -> Tuple[str, str]:
+    """The token and its SHA-256 hex; rows synced from the JSON fallback may store only the hash"""
+    return token, hashlib.sha256(token.encode("utf-8")).hexdigest()
+
 def get_verification_token_from_db(token: str) -> Optional[Dict]:
     """Get verification token from database"""
     if not is_database_available():
@@ -411,9 +739,9 @@ def get_verification_token_from_db(token: str) -> Optional[Dict]:
     query = """
         SELECT *, UNIX_TIMESTAMP(expiry) as expiry_timestamp 
         FROM verification_tokens 
-        WHERE token = %s AND expiry > NOW()
+        WHERE token IN (%s, %s) AND expiry > NOW()
     """
-    result = execute_database_query(query, (token,), fetch=True)
+    result = execute_database_query(query, _verification_token_keys(token), fetch=True)
     return result[0] if result else None
 
 def mark_verification_token_verified(token: str) -> bool:
@@ -421,8 +749,8 @@ def mark_verification_token_verified(token: str) -> bool:
     if not is_database_available():
         return False
     
-    query = "UPDATE verification_tokens SET verified = TRUE WHERE token = %s"
-    result = execute_database_query(query, (token,))
+    query = "UPDATE verification_tokens SET verified = TRUE WHERE token IN (%s, %s)"
+    result = execute_database_query(query, _verification_token_keys(token))
     return result is not None
 
 def is_user_verified_in_db(username: str) -> bool:
@@ -437,6 +765,22 @@ def is_user_verified_in_db(username: str) -> bool:
     result = execute_database_query(query, (username,), fetch=True)
     return bool(result)
 
+def cleanup_expired_verification_tokens_from_db(batch_size: int = 10000) -> int:
+    """Delete expired, unverified verification tokens; returns number of rows removed
+    
+    Verified rows are kept because is_user_verified_in_db reads them.
+    The (verified, expiry) index turns this into an index range scan.
+    """
+    if not is_database_available():
+        return 0
+    
+    query = """
+        DELETE FROM verification_tokens 
+        WHERE verified = FALSE AND expiry < NOW()
+        LIMIT %s
+    """
+    return execute_batched_delete(query, batch_size=batch_size)
+
 # Password reset token functions
 def save_reset_token_to_db(username: str, email: str, token: str, expiry: int) -> bool:
     """Save password reset token to database"""
@@ -477,6 +821,13 @@ def delete_reset_token_from_db(token: str) -> bool:
     result = execute_database_query(query, (token,))
     return result is not None
 
+def consume_reset_token_from_db(token: str) -> Optional[Dict]:
+    """Validate and delete a password reset token in one transaction"""
+    if not is_database_available():
+        return None
+    
+    return db_manager.consume_reset_token(token)
+
 # Cleanup functions
 def cleanup_expired_tokens_from_db() -> int:
     """Clean up expired tokens from database"""
@@ -488,8 +839,7 @@ def cleanup_expired_tokens_from_db() -> int:
     execute_database_query(session_query)
     
     # Clean up expired verification tokens
-    verification_query = "DELETE FROM verification_tokens WHERE expiry < NOW()"
-    execute_database_query(verification_query)
+    cleanup_expired_verification_tokens_from_db()
     
     # Clean up expired reset tokens
     reset_query = "DELETE FROM reset_tokens WHERE expiry < NOW()"
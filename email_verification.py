@@ -1,12 +1,60 @@
 import os
-import json
+import logging
+import hashlib
+import hmac
+import html
+import string
 import time
 import secrets
 import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-from typing import Dict, Optional, Tuple
-from urllib.parse import urlencode
+import threading
+import queue
+from contextlib import contextmanager
+from email.message import EmailMessage
+from typing import Dict, Iterator, List, Optional, Tuple
+from urllib.parse import quote_plus
+from store_utils import json_loads, atomic_write_json
+
+logger = logging.getLogger(__name__)
+
+# SMTP replies worth retrying: service not available, mailbox busy, TLS temporarily unavailable
+TRANSIENT_SMTP_CODES = (421, 450, 454)
+
+VERIFICATION_SUBJECT = "Email Verification Required"
+
+VERIFICATION_HTML_TEMPLATE = """
+<html>
+<body>
+    <h2>Email Verification</h2>
+    <p>Hello $username,</p>
+    <p>Thank you for signing up! Please verify your email address by clicking the link below:</p>
+    <p><a href="$link" style="background-color: #4CAF50; color: white; padding: 10px 20px; text-decoration: none; border-radius: 5px;">Verify Email</a></p>
+    <p>Or copy and paste this link into your browser:</p>
+    <p>$link</p>
+    <p>This link will expire in 24 hours.</p>
+    <p>If you didn't create an account, please ignore this email.</p>
+    <br>
+    <p>Best regards,<br>Your App Team</p>
+</body>
+</html>
+"""
+
+VERIFICATION_TEXT_TEMPLATE = """
+Email Verification
+
+Hello $username,
+
+Thank you for signing up! Please verify your email address by visiting the link below:
+
+$link
+
+This link will expire in 24 hours.
+
+If you didn't create an account, please ignore this email.
+
+Best regards,
+Your App Team
+"""
 
 class EmailVerificationManager:
     """Manages email verification for user accounts"""
@@ -21,27 +69,263 @@ class EmailVerificationManager:
         self.sender_email = "your-email@gmail.com"  # Change to your email
         self.sender_password = "your-app-password"  # Change to your app password
         self.app_url = "https://yourapp.com"  # Change to your app URL
+        
+        # Persistent SMTP session reused across sends
+        self.smtp_max_messages = 1000  # Recycle the connection after this many sends
+        self._smtp = None
+        self._smtp_sent = 0
+        self._smtp_lock = threading.Lock()
+        
+        # Bulk dispatch settings
+        self.bulk_max_workers = 15  # Gmail allows roughly 15 concurrent SMTP sessions
+        self.bulk_recycle_after = 100  # Messages per worker connection before reconnecting
+        self.bulk_max_retries = 3  # Retries on transient SMTP errors (1s, 2s, 4s backoff)
+        
+        # Guards every load -> mutate -> save sequence and the caches below
+        self._lock = threading.RLock()
+        
+        # Set inside defer_writes(): mutations stay in memory until the block ends
+        self._deferring = False
+        self._dirty = False
+        
+        # In-memory cache of the parsed verification data, keyed by file (mtime_ns, size)
+        self._cache_data = None
+        self._cache_signature = None
+        self._token_index: Optional[Dict[str, str]] = None  # token hash -> username
+        self.verified_cache_ttl = 60  # Seconds an is_verified() answer is reused while the file is unchanged
+        self._verified_cache: Dict[str, Tuple[bool, float, Optional[Tuple[int, int]]]] = {}
+        # Plain-text tokens issued by this process (the store only keeps hashes), for reuse
+        self._issued_tokens: Dict[str, str] = {}
+        
+        # Verification URL prefix, rebuilt only if app_url changes
+        self._verify_url_app = self.app_url
+        self._verify_url_prefix = f"{self.app_url}/verify?user="
+        
+        # Email templates, compiled once
+        self._html_tmpl = string.Template(VERIFICATION_HTML_TEMPLATE)
+        self._text_tmpl = string.Template(VERIFICATION_TEXT_TEMPLATE)
     
-    def _load_verifications(self) -> Dict:
-        """Load verification data from JSON file"""
+    @property
+    def smtp_configured(self) -> bool:
+        """False while the sender credentials are still the placeholder values"""
+        return not (self.sender_email.startswith("your-") or self.sender_password.startswith("your-"))
+    
+    def _connect_smtp(self) -> smtplib.SMTP:
+        """Open a new authenticated SMTP session"""
+        server = smtplib.SMTP(self.smtp_server, self.smtp_port, timeout=30)
+        server.starttls()
+        server.login(self.sender_email, self.sender_password)
+        return server
+    
+    def _close_smtp(self):
+        """Close the cached SMTP session, ignoring errors (caller holds the lock)"""
+        if self._smtp is not None:
+            try:
+                self._smtp.quit()
+            except Exception:
+                pass
+        self._smtp = None
+        self._smtp_sent = 0
+    
+    def _get_smtp(self) -> smtplib.SMTP:
+        """Return a live SMTP session, reconnecting if it is stale (caller holds the lock)"""
+        if self._smtp is not None and self._smtp_sent >= self.smtp_max_messages:
+            self._close_smtp()
+        
+        if self._smtp is not None:
+            try:
+                if self._smtp.noop()[0] != 250:
+                    self._close_smtp()
+            except (smtplib.SMTPException, OSError):
+                self._close_smtp()
+        
+        if self._smtp is None:
+            self._smtp = self._connect_smtp()
+        return self._smtp
+    
+    def _send_message(self, msg):
+        """Send a message over the shared SMTP session, reconnecting once if it dropped"""
+        with self._smtp_lock:
+            try:
+                self._get_smtp().send_message(msg)
+            except smtplib.SMTPServerDisconnected:
+                self._close_smtp()
+                self._get_smtp().send_message(msg)
+            self._smtp_sent += 1
+    
+    def close(self):
+        """Close the persistent SMTP connection"""
+        with self._smtp_lock:
+            self._close_smtp()
+    
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
+    
+    @staticmethod
+    def _file_signature(path: str) -> Optional[Tuple[int, int]]:
+        """Return (mtime_ns, size) of a file, or None if it is missing"""
         try:
-            if not os.path.exists(self.verification_file):
+            st = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return st.st_mtime_ns, st.st_size
+    
+    def _store_signature(self) -> Optional[Tuple[int, int]]:
+        """Signature of the verification file"""
+        return self._file_signature(self.verification_file)
+    
+    def _invalidate_cache(self):
+        """Drop cached verification data"""
+        self._cache_data = None
+        self._cache_signature = None
+        self._token_index = None
+        self._verified_cache.clear()
+    
+    @staticmethod
+    def _hash_token(token: str) -> str:
+        """SHA-256 of a token; only the hash is stored, so a leaked file exposes no usable tokens"""
+        return hashlib.sha256(token.encode()).hexdigest()
+    
+    def _stored_token_hash(self, verification_data: Dict) -> str:
+        """Token hash of an entry, also accepting entries written with a plain "token" field"""
+        if "token_hash" in verification_data:
+            return verification_data["token_hash"]
+        if "token" in verification_data:
+            return self._hash_token(verification_data["token"])
+        return ""
+    
+    def _lookup_token(self, token: str) -> Optional[str]:
+        """Return the username a token was issued to, via the token-hash index"""
+        with self._lock:
+            verifications = self._load_verifications()
+            if self._token_index is None:
+                self._token_index = {
+                    self._stored_token_hash(data): username
+                    for username, data in verifications.items()
+                }
+            return self._token_index.get(self._hash_token(token))
+    
+    def _load_verifications(self) -> Dict:
+        """
+        Load verification data (cached until the file changes)
+        
+        verification.json is shared with HybridVerificationManager and the
+        sync manager, so every change is written back as a full snapshot.
+        Callers must not mutate the returned dict.
+        """
+        with self._lock:
+            if self._deferring and self._cache_data is not None:
+                # Pending in-memory changes are newer than the file
+                return self._cache_data
+            try:
+                signature = self._store_signature()
+                if signature is None:
+                    self._invalidate_cache()
+                    return {}
+                if self._cache_data is not None and signature == self._cache_signature:
+                    return self._cache_data
+                
+                with open(self.verification_file, "rb") as f:
+                    data = json_loads(f.read())
+                
+                self._cache_data = data
+                self._cache_signature = signature
+                self._token_index = None
+                self._verified_cache.clear()
+                return data
+            except Exception as e:
+                logger.warning("Failed to load verifications: %s", e)
+                self._invalidate_cache()
                 return {}
-            with open(self.verification_file, "r", encoding="utf-8") as f:
-                return json.load(f)
-        except Exception as e:
-            print(f"Warning: Failed to load verifications: {e}")
-            return {}
     
     def _save_verifications(self, verifications: Dict) -> bool:
-        """Save verification data to JSON file"""
-        try:
-            with open(self.verification_file, "w", encoding="utf-8") as f:
-                json.dump(verifications, f, indent=2)
-            return True
-        except Exception as e:
-            print(f"Error: Failed to save verifications: {e}")
-            return False
+        """Write a full snapshot of the verification data"""
+        with self._lock:
+            try:
+                # Write to a temp file and swap it in so a crash never leaves a truncated file
+                atomic_write_json(self.verification_file, verifications)
+                self._dirty = False
+                
+                self._verified_cache.clear()
+                self._cache_data = verifications
+                self._cache_signature = self._store_signature()
+                self._token_index = None
+                return True
+            except Exception:
+                logger.exception("Failed to save verifications")
+                self._invalidate_cache()
+                return False
+    
+    def _write_entry(self, username: str, entry: Optional[Dict] = None) -> bool:
+        """
+        Set a user's entry (or delete it if entry is None) on a copy of the data and save it
+        
+        Inside defer_writes() the copy only replaces the cached data and is
+        saved when the block ends.
+        """
+        with self._lock:
+            verifications = dict(self._load_verifications())
+            if entry is None:
+                verifications.pop(username, None)
+            else:
+                verifications[username] = entry
+            
+            if self._deferring:
+                self._cache_data = verifications
+                self._token_index = None
+                self._verified_cache.clear()
+                self._dirty = True
+                return True
+            return self._save_verifications(verifications)
+    
+    @contextmanager
+    def bulk_update(self) -> Iterator[Dict]:
+        """
+        Load verification data once, let the caller mutate it, then save it once
+        
+        Usage:
+            with manager.bulk_update() as verifications:
+                verifications[username]["verified"] = False
+        
+        The lock is held for the whole block. Nothing is written if the block raises.
+        """
+        with self._lock:
+            # Copy the entries so edits don't leak into the cache if the block fails
+            verifications = {username: dict(data) for username, data in self._load_verifications().items()}
+            yield verifications
+            self._save_verifications(verifications)
+    
+    @contextmanager
+    def defer_writes(self) -> Iterator[None]:
+        """
+        Keep mutations in memory for the duration of the block and save them once
+        
+        Usage:
+            with manager.defer_writes():
+                token = manager.generate_verification_token(username)
+                manager.verify_email(username, token)
+        
+        The lock is held for the whole block, and pending changes are written
+        as a single snapshot on exit even if the block raises. Nested blocks
+        are flushed by the outermost one.
+        """
+        with self._lock:
+            if self._deferring:
+                yield
+                return
+            
+            self._cache_data = self._load_verifications()
+            self._deferring = True
+            self._dirty = False
+            try:
+                yield
+            finally:
+                self._deferring = False
+                if self._dirty and self._cache_data is not None:
+                    self._save_verifications(self._cache_data)
     
     def generate_verification_token(self, username: str, expiry_hours: int = 24) -> str:
         """
@@ -54,27 +338,50 @@ class EmailVerificationManager:
         Returns:
             str: The generated verification token
         """
-        # Generate secure token
-        token = secrets.token_hex(32)
-        expiry = int(time.time()) + (expiry_hours * 3600)
-        
-        # Load existing verifications
-        verifications = self._load_verifications()
-        
-        # Create/update verification entry
-        verifications[username] = {
-            "token": token,
-            "expiry": expiry,
-            "verified": False,
-            "created": int(time.time())
-        }
-        
-        # Save verifications
-        if self._save_verifications(verifications):
-            print(f"DEBUG: Generated verification token for {username}, expires at {expiry}")
-            return token
-        else:
-            raise Exception("Failed to save verification token")
+        with self._lock:
+            # Generate secure token
+            token = secrets.token_urlsafe(32)
+            expiry = int(time.time()) + (expiry_hours * 3600)
+            
+            # Create/update verification entry
+            entry = {
+                "token_hash": self._hash_token(token),
+                "expiry": expiry,
+                "verified": False,
+                "created": int(time.time())
+            }
+            
+            if self._write_entry(username, entry):
+                logger.debug("Generated verification token for %s, expires at %d", username, expiry)
+                self._issued_tokens[username] = token
+                return token
+            else:
+                raise Exception("Failed to save verification token")
+    
+    def get_or_create_verification_token(self, username: str, expiry_hours: int = 24) -> str:
+        """
+        Return the user's pending verification token, generating one only if needed
+        
+        A token can only be reused if this process issued it, since the store
+        keeps just its hash. A new token is generated when there is none, it
+        has expired or been verified, or it was replaced elsewhere.
+        
+        Args:
+            username: The username to get a token for
+            expiry_hours: Hours until a newly generated token expires
+            
+        Returns:
+            str: A valid verification token
+        """
+        with self._lock:
+            token = self._issued_tokens.get(username)
+            verification_data = self._load_verifications().get(username)
+            if (token is not None and verification_data is not None
+                    and not verification_data.get("verified", False)
+                    and int(time.time()) <= verification_data.get("expiry", 0)
+                    and hmac.compare_digest(self._stored_token_hash(verification_data), self._hash_token(token))):
+                return token
+            return self.generate_verification_token(username, expiry_hours)
     
     def verify_email(self, username: str, token: str) -> bool:
         """
@@ -87,44 +394,62 @@ class EmailVerificationManager:
         Returns:
             bool: True if verification succeeded, False otherwise
         """
-        verifications = self._load_verifications()
-        current_time = int(time.time())
-        
-        # Check if user has a verification entry
-        if username not in verifications:
-            print(f"DEBUG: No verification found for {username}")
-            return False
-        
-        verification_data = verifications[username]
-        
-        # Check if already verified
-        if verification_data.get("verified", False):
-            print(f"DEBUG: User {username} is already verified")
-            return True
-        
-        # Check if token matches
-        if verification_data.get("token") != token:
-            print(f"DEBUG: Token mismatch for {username}")
-            return False
-        
-        # Check if token is expired
-        if current_time > verification_data.get("expiry", 0):
-            print(f"DEBUG: Verification token expired for {username}")
-            # Remove expired verification
-            del verifications[username]
-            self._save_verifications(verifications)
-            return False
-        
-        # Mark as verified
-        verifications[username]["verified"] = True
-        verifications[username]["verified_at"] = current_time
+        with self._lock:
+            verifications = self._load_verifications()
+            current_time = int(time.time())
+            
+            # Check if user has a verification entry
+            if username not in verifications:
+                logger.debug("No verification found for %s", username)
+                return False
+            
+            verification_data = verifications[username]
+            
+            # Check if already verified
+            if verification_data.get("verified", False):
+                logger.debug("User %s is already verified", username)
+                return True
+            
+            # Check if token matches (constant-time)
+            if not hmac.compare_digest(self._stored_token_hash(verification_data), self._hash_token(token)):
+                logger.debug("Token mismatch for %s", username)
+                return False
+            
+            # Check if token is expired
+            if current_time > verification_data.get("expiry", 0):
+                logger.debug("Verification token expired for %s", username)
+                # Remove expired verification
+                self._write_entry(username)
+                return False
+            
+            # Mark as verified
+            entry = dict(verification_data, verified=True, verified_at=current_time)
+            entry.pop("token", None)
+            entry["token_hash"] = self._stored_token_hash(verification_data)
+            
+            if self._write_entry(username, entry):
+                logger.debug("Email verified for %s", username)
+                self._issued_tokens.pop(username, None)
+                return True
+            else:
+                logger.debug("Failed to mark %s as verified", username)
+                return False
+    
+    def verify_token(self, token: str) -> Optional[str]:
+        """
+        Verify an email using only the token (for links that omit the username)
         
-        if self._save_verifications(verifications):
-            print(f"DEBUG: Email verified for {username}")
-            return True
-        else:
-            print(f"DEBUG: Failed to mark {username} as verified")
-            return False
+        Args:
+            token: The verification token
+            
+        Returns:
+            str: The verified username, or None if the token is unknown or invalid
+        """
+        username = self._lookup_token(token)
+        if username is None:
+            logger.debug("No verification found for token")
+            return None
+        return username if self.verify_email(username, token) else None
     
     def is_verified(self, username: str) -> bool:
         """
@@ -136,12 +461,20 @@ class EmailVerificationManager:
         Returns:
             bool: True if verified, False otherwise
         """
-        verifications = self._load_verifications()
-        
-        if username not in verifications:
-            return False
-        
-        return verifications[username].get("verified", False)
+        with self._lock:
+            now = time.monotonic()
+            # Other processes rewrite verification.json, so an answer is only
+            # reused while the file signature it was read under still holds
+            signature = self._store_signature()
+            cached = self._verified_cache.get(username)
+            if (cached is not None and now - cached[1] < self.verified_cache_ttl
+                    and cached[2] == signature):
+                return cached[0]
+            
+            verifications = self._load_verifications()
+            verified = bool(verifications.get(username, {}).get("verified", False))
+            self._verified_cache[username] = (verified, now, self._store_signature())
+            return verified
     
     def get_verification_info(self, username: str) -> Optional[Dict]:
         """
@@ -153,8 +486,11 @@ class EmailVerificationManager:
         Returns:
             Dict with verification info or None if no verification
         """
-        verifications = self._load_verifications()
-        return verifications.get(username)
+        with self._lock:
+            verifications = self._load_verifications()
+            info = verifications.get(username)
+            # Copy so callers can't mutate the cached entry
+            return dict(info) if info is not None else None
     
     def resend_verification(self, username: str, expiry_hours: int = 24) -> str:
         """
@@ -176,23 +512,52 @@ class EmailVerificationManager:
         Returns:
             int: Number of verifications cleaned up
         """
-        verifications = self._load_verifications()
-        current_time = int(time.time())
-        expired_users = []
-        
-        for username, verification_data in verifications.items():
-            # Only remove unverified expired tokens
-            if not verification_data.get("verified", False) and current_time > verification_data.get("expiry", 0):
-                expired_users.append(username)
+        with self._lock:
+            verifications = self._load_verifications()
+            current_time = int(time.time())
+
+            # Single pass: keep verified entries and unexpired tokens
+            kept = {
+                username: verification_data
+                for username, verification_data in verifications.items()
+                if verification_data.get("verified", False) or current_time <= verification_data.get("expiry", 0)
+            }
+            removed = len(verifications) - len(kept)
+
+            if removed:
+                self._save_verifications(kept)
+                logger.debug("Cleaned up %d expired verifications", removed)
+
+            return removed
+    
+    def _verification_link(self, username: str, token: str) -> str:
+        """Build the verification URL from the cached prefix"""
+        if self._verify_url_app != self.app_url:
+            self._verify_url_app = self.app_url
+            self._verify_url_prefix = f"{self.app_url}/verify?user="
+        return f"{self._verify_url_prefix}{quote_plus(username)}&token={quote_plus(token, safe='-_')}"
+    
+    def _build_message(self, username: str, email: str, token: str) -> EmailMessage:
+        """Build the verification email message for a user"""
+        # Create verification link
+        verification_link = self._verification_link(username, token)
         
-        for username in expired_users:
-            del verifications[username]
+        # Render email content from the precompiled templates
+        html_body = self._html_tmpl.substitute(
+            username=html.escape(username),
+            link=html.escape(verification_link)
+        )
+        text_body = self._text_tmpl.substitute(username=username, link=verification_link)
         
-        if expired_users:
-            self._save_verifications(verifications)
-            print(f"DEBUG: Cleaned up {len(expired_users)} expired verifications")
+        # Create message with plain text and an HTML alternative
+        msg = EmailMessage()
+        msg['Subject'] = VERIFICATION_SUBJECT
+        msg['From'] = self.sender_email
+        msg['To'] = email
+        msg.set_content(text_body)
+        msg.add_alternative(html_body, subtype='html')
         
-        return len(expired_users)
+        return msg
     
     def send_verification_email(self, username: str, email: str, token: str) -> bool:
         """
@@ -206,73 +571,137 @@ class EmailVerificationManager:
         Returns:
             bool: True if email sent successfully
         """
+        # Fail fast before rendering or connecting when credentials are placeholders
+        if not self.smtp_configured:
+            logger.error("SMTP not configured, verification email to %s not sent", email)
+            return False
+        
         try:
-            # Create verification link
-            verification_link = f"{self.app_url}/verify?{urlencode({'user': username, 'token': token})}"
-            
-            # Create email content
-            subject = "Email Verification Required"
-            
-            html_body = f"""
-            <html>
-            <body>
-                <h2>Email Verification</h2>
-                <p>Hello {username},</p>
-                <p>Thank you for signing up! Please verify your email address by clicking the link below:</p>
-                <p><a href="{verification_link}" style="background-color: #4CAF50; color: white; padding: 10px 20px; text-decoration: none; border-radius: 5px;">Verify Email</a></p>
-                <p>Or copy and paste this link into your browser:</p>
-                <p>{verification_link}</p>
-                <p>This link will expire in 24 hours.</p>
-                <p>If you didn't create an account, please ignore this email.</p>
-                <br>
-                <p>Best regards,<br>Your App Team</p>
-            </body>
-            </html>
-            """
-            
-            text_body = f"""
-            Email Verification
-            
-            Hello {username},
+            msg = self._build_message(username, email, token)
             
-            Thank you for signing up! Please verify your email address by visiting the link below:
+            # Send email over the shared SMTP session
+            self._send_message(msg)
             
-            {verification_link}
-            
-            This link will expire in 24 hours.
-            
-            If you didn't create an account, please ignore this email.
-            
-            Best regards,
-            Your App Team
-            """
-            
-            # Create message
-            msg = MIMEMultipart('alternative')
-            msg['Subject'] = subject
-            msg['From'] = self.sender_email
-            msg['To'] = email
-            
-            # Add both plain text and HTML versions
-            text_part = MIMEText(text_body, 'plain')
-            html_part = MIMEText(html_body, 'html')
-            
-            msg.attach(text_part)
-            msg.attach(html_part)
-            
-            # Send email
-            with smtplib.SMTP(self.smtp_server, self.smtp_port) as server:
-                server.starttls()
-                server.login(self.sender_email, self.sender_password)
-                server.send_message(msg)
-            
-            print(f"DEBUG: Verification email sent to {email}")
+            logger.debug("Verification email sent to %s", email)
             return True
             
-        except Exception as e:
-            print(f"Error: Failed to send verification email: {e}")
+        except Exception:
+            logger.exception("Failed to send verification email")
             return False
     
+    def send_verification_emails_bulk(self, tasks: List[Tuple[str, str, str]],
+                                      concurrency: Optional[int] = None) -> List[bool]:
+        """
+        Send verification emails to many users in parallel
+        
+        Messages are rendered on the calling thread and handed to worker
+        threads through a bounded queue. Each worker owns its own SMTP
+        connection, so sends to different users overlap instead of
+        queueing behind one session.
+        
+        Args:
+            tasks: List of (username, email, token) tuples
+            concurrency: Number of worker connections (default: min(5, len(tasks)))
+            
+        Returns:
+            List[bool]: Send result for each task, in the same order
+        """
+        results = [False] * len(tasks)
+        if not tasks:
+            return results
+        
+        if not self.smtp_configured:
+            logger.error("SMTP not configured, %d verification emails not sent", len(tasks))
+            return results
+        
+        if concurrency is None:
+            concurrency = min(5, len(tasks))
+        concurrency = max(1, min(concurrency, self.bulk_max_workers, len(tasks)))
+        
+        # Bounded queue gives back-pressure: rendering stays at most a couple of messages ahead
+        message_queue = queue.Queue(maxsize=2 * concurrency)
+        workers = [
+            threading.Thread(target=self._bulk_worker, args=(message_queue, results), daemon=True)
+            for _ in range(concurrency)
+        ]
+        for worker in workers:
+            worker.start()
+        
+        # Render messages here so the SMTP workers only spend time on the network
+        try:
+            for index, (username, email, token) in enumerate(tasks):
+                try:
+                    msg = self._build_message(username, email, token)
+                except Exception:
+                    logger.exception("Failed to build verification email for %s", email)
+                    continue
+                message_queue.put((index, email, msg))
+        finally:
+            for _ in workers:
+                message_queue.put(None)
+            for worker in workers:
+                worker.join()
+        
+        logger.debug("Bulk send finished, %d/%d verification emails sent", sum(results), len(tasks))
+        return results
+    
+    def _bulk_worker(self, message_queue: "queue.Queue", results: List[bool]):
+        """Worker loop for bulk sends; owns one SMTP connection until the sentinel arrives"""
+        server = None
+        sent = 0
+        try:
+            while (item := message_queue.get()) is not None:
+                index, email, msg = item
+                
+                # Recycle the connection periodically
+                if server is not None and sent >= self.bulk_recycle_after:
+                    self._quit_quietly(server)
+                    server, sent = None, 0
+                
+                try:
+                    server = self._send_with_retry(server, msg)
+                    sent += 1
+                    results[index] = True
+                except Exception:
+                    logger.exception("Failed to send verification email to %s", email)
+                    self._quit_quietly(server)
+                    server, sent = None, 0
+        finally:
+            self._quit_quietly(server)
+    
+    def _send_with_retry(self, server: Optional[smtplib.SMTP], msg) -> smtplib.SMTP:
+        """Send msg, backing off on transient SMTP errors; returns the connection used"""
+        delay = 1
+        for attempt in range(self.bulk_max_retries + 1):
+            try:
+                if server is None:
+                    server = self._connect_smtp()
+                server.send_message(msg)
+                return server
+            except smtplib.SMTPServerDisconnected:
+                server = None
+                if attempt == self.bulk_max_retries:
+                    raise
+            except smtplib.SMTPResponseException as e:
+                if e.smtp_code not in TRANSIENT_SMTP_CODES or attempt == self.bulk_max_retries:
+                    raise
+                if e.smtp_code == 421:
+                    # Service closing the channel; reconnect after the backoff
+                    self._quit_quietly(server)
+                    server = None
+            time.sleep(delay)
+            delay *= 2
+        return server
+    
+    @staticmethod
+    def _quit_quietly(server: Optional[smtplib.SMTP]):
+        """Close an SMTP connection, ignoring errors"""
+        if server is not None:
+            try:
+                server.quit()
+            except Exception:
+                pass
+    
     def send_verification_email_simulation(self, username: str, email: str, token: str) -> bool:
         """
         Simulate sending verification email (for demo purposes)
@@ -286,7 +715,7 @@ class EmailVerificationManager:
             bool: True if simulation successful
         """
         # Create verification link
-        verification_link = f"{self.app_url}/verify?{urlencode({'user': username, 'token': token})}"
+        verification_link = self._verification_link(username, token)
         
         print("=" * 60)
         print("EMAIL VERIFICATION SIMULATION")
@@ -311,43 +740,77 @@ class EmailVerificationManager:
         return True
 
 
-# Global verification manager instance
-verification_manager = EmailVerificationManager()
+# Global verification manager instance, created lazily on first use
+_instance: Optional[EmailVerificationManager] = None
+_instance_lock = threading.Lock()
+
+
+def get_verification_manager() -> EmailVerificationManager:
+    """Return the shared verification manager, creating it on first use"""
+    global _instance
+    if _instance is None:
+        with _instance_lock:
+            if _instance is None:
+                _instance = EmailVerificationManager()
+    return _instance
+
+
+def __getattr__(name: str):
+    # Keep `from email_verification import verification_manager` working without
+    # constructing the manager at import time
+    if name == "verification_manager":
+        return get_verification_manager()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 def generate_verification_token(username: str, expiry_hours: int = 24) -> str:
     """Convenience function to generate verification token"""
-    return verification_manager.generate_verification_token(username, expiry_hours)
+    return get_verification_manager().generate_verification_token(username, expiry_hours)
+
+
+def get_or_create_verification_token(username: str, expiry_hours: int = 24) -> str:
+    """Convenience function to reuse a pending verification token or generate one"""
+    return get_verification_manager().get_or_create_verification_token(username, expiry_hours)
 
 
 def verify_email(username: str, token: str) -> bool:
     """Convenience function to verify email"""
-    return verification_manager.verify_email(username, token)
+    return get_verification_manager().verify_email(username, token)
+
+
+def verify_token(token: str) -> Optional[str]:
+    """Convenience function to verify email by token alone"""
+    return get_verification_manager().verify_token(token)
 
 
 def is_verified(username: str) -> bool:
     """Convenience function to check if user is verified"""
-    return verification_manager.is_verified(username)
+    return get_verification_manager().is_verified(username)
 
 
 def resend_verification(username: str, expiry_hours: int = 24) -> str:
     """Convenience function to resend verification"""
-    return verification_manager.resend_verification(username, expiry_hours)
+    return get_verification_manager().resend_verification(username, expiry_hours)
 
 
 def send_verification_email(username: str, email: str, token: str) -> bool:
     """Convenience function to send verification email"""
-    return verification_manager.send_verification_email(username, email, token)
+    return get_verification_manager().send_verification_email(username, email, token)
+
+
+def send_verification_emails_bulk(tasks: List[Tuple[str, str, str]], concurrency: Optional[int] = None) -> List[bool]:
+    """Convenience function to send verification emails to many users"""
+    return get_verification_manager().send_verification_emails_bulk(tasks, concurrency)
 
 
 def send_verification_email_simulation(username: str, email: str, token: str) -> bool:
     """Convenience function to simulate sending verification email"""
-    return verification_manager.send_verification_email_simulation(username, email, token)
+    return get_verification_manager().send_verification_email_simulation(username, email, token)
 
 
 def cleanup_expired_verifications() -> int:
     """Convenience function to cleanup expired verifications"""
-    return verification_manager.cleanup_expired_verifications()
+    return get_verification_manager().cleanup_expired_verifications()
 
 
 # Demo function to show usage
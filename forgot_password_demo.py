@@ -6,8 +6,8 @@ Comprehensive demonstration of the password reset functionality
 
 import sys
 import os
-import json
 import time
+import heapq
 from PyQt6 import QtWidgets, QtCore, QtGui
 from password_reset_manager import (
     generate_reset_token, validate_reset_token, reset_password, 
@@ -15,193 +15,92 @@ from password_reset_manager import (
 )
 from forgot_password_dialog import show_forgot_password_dialog
 from reset_password_dialog import show_reset_password_dialog
+from password_hashing import hash_password
+from ui_loader import load_ui
+from store_utils import json_loads, json_dumps
+
+
+# Most tokens listed by "View Active Tokens"
+MAX_TOKENS_SHOWN = 50
+
+# Last formatted log timestamp: [epoch second, "HH:MM:SS"]
+_TS_CACHE = [0, ""]
+
+
+def _timestamp() -> str:
+    """Return the current HH:MM:SS, formatting at most once per second"""
+    now = int(time.time())
+    if now != _TS_CACHE[0]:
+        _TS_CACHE[:] = [now, time.strftime("%H:%M:%S", time.localtime(now))]
+    return _TS_CACHE[1]
+
+
+# Demo-only: reuse the test user's hash across repeated "Create Test User" clicks
+_HASH_CACHE: dict[str, str] = {}
+
+
+def _load_tokens() -> dict:
+    """Read reset_tokens.json in one binary read and parse it"""
+    with open("reset_tokens.json", 'rb') as f:
+        return json_loads(f.read())
+
+
+def _atomic_write(path: str, data: bytes):
+    """Write pre-serialized bytes to a temp file with raw os.write, fsync, then rename over path"""
+    tmp_path = path + ".tmp"
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    try:
+        view = memoryview(data)
+        while view:
+            written = os.write(fd, view)
+            view = view[written:]
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+    os.replace(tmp_path, path)
+
+
+class _WriteSignals(QtCore.QObject):
+    """Signals emitted by _WriteWorker"""
+    finished = QtCore.pyqtSignal(str)  # error message, empty on success
+
+
+class _WriteWorker(QtCore.QRunnable):
+    """Runs _atomic_write on a thread pool thread"""
+    
+    def __init__(self, path: str, data: bytes):
+        super().__init__()
+        self.path = path
+        self.data = data
+        self.signals = _WriteSignals()
+    
+    def run(self):
+        try:
+            _atomic_write(self.path, self.data)
+            error = ""
+        except OSError as e:
+            error = str(e) or e.__class__.__name__
+        self.signals.finished.emit(error)
+
 
 class ForgotPasswordDemoWindow(QtWidgets.QMainWindow):
     """Demo window for forgot password system"""
     
     def __init__(self):
         super().__init__()
-        self.setWindowTitle("Forgot Password System Demo")
-        self.setGeometry(100, 100, 800, 600)
         
-        # Create central widget
-        central_widget = QtWidgets.QWidget()
-        self.setCentralWidget(central_widget)
+        # Widgets, layout and stylesheet come from the Designer file
+        ui_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ForgotPasswordDemo.ui")
+        load_ui(ui_path, self)
         
-        # Create layout
-        layout = QtWidgets.QVBoxLayout(central_widget)
+        self._write_worker = None
         
-        # Add title
-        title = QtWidgets.QLabel("Forgot Password System Demo")
-        title.setStyleSheet("""
-            font-size: 28px;
-            font-weight: bold;
-            color: #2c3e50;
-            margin: 20px;
-        """)
-        title.setAlignment(QtCore.Qt.AlignmentFlag.AlignCenter)
-        layout.addWidget(title)
-        
-        # Add description
-        description = QtWidgets.QLabel("""
-        This demo showcases the complete forgot password workflow:
-        <ol>
-            <li><b>Request Reset:</b> User enters username/email to request password reset</li>
-            <li><b>Token Generation:</b> System generates secure token and stores it</li>
-            <li><b>Email Simulation:</b> Reset link is sent to user's email</li>
-            <li><b>Password Reset:</b> User clicks link and enters new password</li>
-            <li><b>Login:</b> User can now login with new password</li>
-        </ol>
-        """)
-        description.setStyleSheet("""
-            font-size: 14px;
-            color: #34495e;
-            padding: 20px;
-            background-color: #f8f9fa;
-            border-radius: 8px;
-            margin: 10px;
-        """)
-        description.setWordWrap(True)
-        layout.addWidget(description)
-        
-        # Add demo buttons
-        button_layout = QtWidgets.QGridLayout()
-        
-        # Test user creation
-        self.create_user_btn = QtWidgets.QPushButton("Create Test User")
-        self.create_user_btn.setStyleSheet("""
-            QPushButton {
-                background-color: #27ae60;
-                color: white;
-                border: none;
-                padding: 15px 20px;
-                border-radius: 8px;
-                font-size: 14px;
-                font-weight: bold;
-            }
-            QPushButton:hover {
-                background-color: #229954;
-            }
-        """)
         self.create_user_btn.clicked.connect(self.create_test_user)
-        button_layout.addWidget(self.create_user_btn, 0, 0)
-        
-        # Forgot password dialog
-        self.forgot_btn = QtWidgets.QPushButton("Open Forgot Password Dialog")
-        self.forgot_btn.setStyleSheet("""
-            QPushButton {
-                background-color: #3498db;
-                color: white;
-                border: none;
-                padding: 15px 20px;
-                border-radius: 8px;
-                font-size: 14px;
-                font-weight: bold;
-            }
-            QPushButton:hover {
-                background-color: #2980b9;
-            }
-        """)
         self.forgot_btn.clicked.connect(self.open_forgot_password_dialog)
-        button_layout.addWidget(self.forgot_btn, 0, 1)
-        
-        # Reset password dialog
-        self.reset_btn = QtWidgets.QPushButton("Open Reset Password Dialog")
-        self.reset_btn.setStyleSheet("""
-            QPushButton {
-                background-color: #e74c3c;
-                color: white;
-                border: none;
-                padding: 15px 20px;
-                border-radius: 8px;
-                font-size: 14px;
-                font-weight: bold;
-            }
-            QPushButton:hover {
-                background-color: #c0392b;
-            }
-        """)
         self.reset_btn.clicked.connect(self.open_reset_password_dialog)
-        button_layout.addWidget(self.reset_btn, 0, 2)
-        
-        # Token management
-        self.cleanup_btn = QtWidgets.QPushButton("Cleanup Expired Tokens")
-        self.cleanup_btn.setStyleSheet("""
-            QPushButton {
-                background-color: #f39c12;
-                color: white;
-                border: none;
-                padding: 15px 20px;
-                border-radius: 8px;
-                font-size: 14px;
-                font-weight: bold;
-            }
-            QPushButton:hover {
-                background-color: #e67e22;
-            }
-        """)
         self.cleanup_btn.clicked.connect(self.cleanup_tokens)
-        button_layout.addWidget(self.cleanup_btn, 1, 0)
-        
-        # Test token generation
-        self.test_token_btn = QtWidgets.QPushButton("Test Token Generation")
-        self.test_token_btn.setStyleSheet("""
-            QPushButton {
-                background-color: #9b59b6;
-                color: white;
-                border: none;
-                padding: 15px 20px;
-                border-radius: 8px;
-                font-size: 14px;
-                font-weight: bold;
-            }
-            QPushButton:hover {
-                background-color: #8e44ad;
-            }
-        """)
         self.test_token_btn.clicked.connect(self.test_token_generation)
-        button_layout.addWidget(self.test_token_btn, 1, 1)
-        
-        # View tokens
-        self.view_tokens_btn = QtWidgets.QPushButton("View Active Tokens")
-        self.view_tokens_btn.setStyleSheet("""
-            QPushButton {
-                background-color: #34495e;
-                color: white;
-                border: none;
-                padding: 15px 20px;
-                border-radius: 8px;
-                font-size: 14px;
-                font-weight: bold;
-            }
-            QPushButton:hover {
-                background-color: #2c3e50;
-            }
-        """)
         self.view_tokens_btn.clicked.connect(self.view_active_tokens)
-        button_layout.addWidget(self.view_tokens_btn, 1, 2)
-        
-        layout.addLayout(button_layout)
-        
-        # Add status area
-        self.status_text = QtWidgets.QTextEdit()
-        self.status_text.setReadOnly(True)
-        self.status_text.setStyleSheet("""
-            QTextEdit {
-                background-color: #2c3e50;
-                color: #ecf0f1;
-                border: 1px solid #34495e;
-                border-radius: 8px;
-                padding: 10px;
-                font-family: 'Courier New', monospace;
-                font-size: 12px;
-            }
-        """)
-        self.status_text.setMaximumHeight(200)
-        layout.addWidget(self.status_text)
-        
-        # Add some spacing
-        layout.addStretch()
         
         # Initialize status
         self.log_status("Forgot Password System Demo initialized")
@@ -209,41 +108,68 @@ class ForgotPasswordDemoWindow(QtWidgets.QMainWindow):
     
     def log_status(self, message: str):
         """Log status message"""
-        timestamp = time.strftime("%H:%M:%S")
+        timestamp = _timestamp()
         self.status_text.append(f"[{timestamp}] {message}")
         self.status_text.ensureCursorVisible()
     
+    def log_batch(self, lines: list[str]):
+        """Log several status lines with a single document update"""
+        if not lines:
+            return
+        timestamp = _timestamp()
+        text = "\n".join(f"[{timestamp}] {line}" for line in lines)
+        if not self.status_text.document().isEmpty():
+            text = "\n" + text
+        
+        cursor = self.status_text.textCursor()
+        cursor.movePosition(QtGui.QTextCursor.MoveOperation.End)
+        cursor.insertText(text)
+        self.status_text.setTextCursor(cursor)
+        self.status_text.ensureCursorVisible()
+    
     def create_test_user(self):
         """Create a test user for demo purposes"""
         try:
             # Load existing users
-            users = {}
-            if os.path.exists("users.json"):
-                with open("users.json", 'r') as f:
-                    users = json.load(f)
+            try:
+                with open("users.json", 'rb') as f:
+                    users = json_loads(f.read())
+            except FileNotFoundError:
+                users = {}
             
             # Create test user
-            import hashlib
+            password_hash = _HASH_CACHE.get("oldpassword")
+            if password_hash is None:
+                password_hash = _HASH_CACHE["oldpassword"] = hash_password("oldpassword")
             test_user = {
                 "username": "testuser",
                 "email": "test@example.com",
-                "password": hashlib.sha256("oldpassword".encode()).hexdigest()
+                "password": password_hash
             }
             
             # Add to users (overwrite if exists)
             users["testuser"] = test_user
             
-            # Save users
-            with open("users.json", 'w') as f:
-                json.dump(users, f, indent=2)
-            
-            self.log_status("✅ Test user created: testuser / test@example.com")
-            self.log_status("   Password: oldpassword")
-            self.log_status("   You can now test the forgot password flow")
+            # Save users off the GUI thread
+            self._write_worker = _WriteWorker("users.json", json_dumps(users, indent=True))
+            self._write_worker.signals.finished.connect(self._on_test_user_saved)
+            QtCore.QThreadPool.globalInstance().start(self._write_worker)
             
         except Exception as e:
             self.log_status(f"❌ Error creating test user: {e}")
     
+    def _on_test_user_saved(self, error: str):
+        """Report the result of the background users.json write"""
+        self._write_worker = None
+        if error:
+            self.log_status(f"❌ Error creating test user: {error}")
+            return
+        self.log_batch([
+            "✅ Test user created: testuser / test@example.com",
+            "   Password: oldpassword",
+            "   You can now test the forgot password flow",
+        ])
+    
     def open_forgot_password_dialog(self):
         """Open the forgot password dialog"""
         try:
@@ -310,31 +236,41 @@ class ForgotPasswordDemoWindow(QtWidgets.QMainWindow):
         try:
             self.log_status("Viewing active reset tokens...")
             
-            if not os.path.exists("reset_tokens.json"):
+            try:
+                tokens = _load_tokens()
+            except FileNotFoundError:
                 self.log_status("ℹ️ No reset tokens file found")
                 return
             
-            with open("reset_tokens.json", 'r') as f:
-                tokens = json.load(f)
+            current_time = int(time.time())
+            show_expired = self.show_expired_check.isChecked()
             
-            if not tokens:
+            # Expired tokens are filtered out before ranking unless requested
+            candidates = (
+                (token, data) for token, data in tokens.items()
+                if show_expired or current_time <= data['expiry']
+            )
+            shown = heapq.nlargest(MAX_TOKENS_SHOWN, candidates, key=lambda item: item[1]['expiry'])
+            
+            if not shown:
                 self.log_status("ℹ️ No active reset tokens found")
                 return
             
-            self.log_status(f"📋 Found {len(tokens)} active token(s):")
-            current_time = int(time.time())
+            self.log_status(f"📋 Showing {len(shown)} of {len(tokens)} token(s), latest expiry first:")
             
-            for token, data in tokens.items():
-                expiry_time = data['expiry']
-                is_expired = current_time > expiry_time
-                status = "❌ EXPIRED" if is_expired else "✅ ACTIVE"
-                
-                self.log_status(f"   Token: {token[:20]}...")
-                self.log_status(f"   User: {data['username']}")
-                self.log_status(f"   Email: {data['email']}")
-                self.log_status(f"   Expires: {time.ctime(expiry_time)}")
-                self.log_status(f"   Status: {status}")
-                self.log_status("   " + "-" * 40)
+            buf = [
+                line
+                for token, data in shown
+                for line in (
+                    f"   Token: {token[:20]}...",
+                    f"   User: {data['username']}",
+                    f"   Email: {data['email']}",
+                    f"   Expires: {time.ctime(data['expiry'])}",
+                    f"   Status: {'❌ EXPIRED' if current_time > data['expiry'] else '✅ ACTIVE'}",
+                    "   " + "-" * 40,
+                )
+            ]
+            self.log_batch(buf)
                 
         except Exception as e:
             self.log_status(f"❌ Error viewing tokens: {e}")
@@ -365,7 +301,7 @@ def demo_forgot_password_system():
     print("   🔒 Token expiry (1 hour default)")
     print("   🔒 Automatic token cleanup")
     print("   🔒 Password strength validation")
-    print("   🔒 SHA256 password hashing")
+    print("   🔒 Salted Argon2id/scrypt password hashing")
     
     print("\n4. File Structure:")
     print("   📁 reset_tokens.json - Stores active reset tokens")
@@ -6,9 +6,124 @@ Dialog for requesting password reset
 
 import sys
 from PyQt6 import QtWidgets, QtCore, QtGui, uic
-from password_reset_manager import generate_reset_token
+from password_reset_manager import generate_reset_token, find_user
 from email_service import send_reset_email
 
+# Seconds before another reset link can be requested
+SEND_COOLDOWN_SECONDS = 30
+
+# Single stylesheet for the dialog; widgets are targeted by object name so Qt
+# parses it once per dialog instead of once per widget
+_DIALOG_QSS = """
+    QDialog {
+        background-color: #f8f9fa;
+        border-radius: 10px;
+    }
+    QLabel#title {
+        font-size: 24px;
+        font-weight: bold;
+        color: #2c3e50;
+        margin-bottom: 10px;
+    }
+    QLabel#description {
+        font-size: 14px;
+        color: #7f8c8d;
+        margin-bottom: 20px;
+    }
+    QLabel#inputLabel {
+        font-size: 14px;
+        font-weight: bold;
+        color: #34495e;
+    }
+    QLineEdit#emailInput {
+        padding: 15px;
+        border: 2px solid #bdc3c7;
+        border-radius: 8px;
+        font-size: 16px;
+        background-color: white;
+        color: black;
+        min-height: 20px;
+    }
+    QLineEdit#emailInput:focus {
+        border-color: #3498db;
+        color: black;
+    }
+    QLabel#statusLabel {
+        font-size: 14px;
+        padding: 20px;
+        border-radius: 8px;
+        margin: 15px 0;
+        min-height: 30px;
+    }
+    QLabel#statusLabel[state="clear"],
+    QLabel#statusLabel[state="success"],
+    QLabel#statusLabel[state="error"] {
+        font-size: 12px;
+        padding: 10px;
+        border-radius: 5px;
+        margin: 10px 0;
+    }
+    QLabel#statusLabel[state="success"] {
+        color: #27ae60;
+        background-color: #f0f9f0;
+        border: 1px solid #27ae60;
+    }
+    QLabel#statusLabel[state="error"] {
+        color: #e74c3c;
+        background-color: #fdf2f2;
+        border: 1px solid #e74c3c;
+    }
+    QPushButton#cancelBtn, QPushButton#sendBtn {
+        color: white;
+        border: none;
+        padding: 12px 24px;
+        border-radius: 8px;
+        font-size: 14px;
+        font-weight: bold;
+    }
+    QPushButton#cancelBtn {
+        background-color: #95a5a6;
+    }
+    QPushButton#cancelBtn:hover {
+        background-color: #7f8c8d;
+    }
+    QPushButton#cancelBtn:pressed {
+        background-color: #6c7b7d;
+    }
+    QPushButton#sendBtn {
+        background-color: #3498db;
+    }
+    QPushButton#sendBtn:hover {
+        background-color: #2980b9;
+    }
+    QPushButton#sendBtn:pressed {
+        background-color: #21618c;
+    }
+"""
+
+
+class _SendSignals(QtCore.QObject):
+    """Signals emitted by _SendWorker"""
+    finished = QtCore.pyqtSignal(bool, str)  # email_sent, email
+
+
+class _SendWorker(QtCore.QRunnable):
+    """Sends a reset email on a thread pool thread"""
+    
+    def __init__(self, username: str, email: str, token: str):
+        super().__init__()
+        self.username = username
+        self.email = email
+        self.token = token
+        self.signals = _SendSignals()
+    
+    def run(self):
+        try:
+            email_sent = send_reset_email(self.username, self.email, self.token)
+        except Exception:
+            email_sent = False
+        self.signals.finished.emit(email_sent, self.email)
+
 class ForgotPasswordDialog(QtWidgets.QDialog):
     """Dialog for requesting password reset"""
     
@@ -18,8 +133,13 @@ class ForgotPasswordDialog(QtWidgets.QDialog):
         self.setModal(True)
         self.setFixedSize(550, 450)
         
-        self.send_timer = None
-        self.send_countdown = 0
+        # Resend cooldown: a single single-shot timer re-enables sending. The button
+        # shows when that happens instead of ticking down every second.
+        self.send_cooldown = QtCore.QTimer(self)
+        self.send_cooldown.setSingleShot(True)
+        self.send_cooldown.setInterval(SEND_COOLDOWN_SECONDS * 1000)
+        self.send_cooldown.timeout.connect(self._reenable_send)
+        self._send_worker = None
         
         # Set window icon if available
         try:
@@ -41,12 +161,7 @@ class ForgotPasswordDialog(QtWidgets.QDialog):
         # Title
         title = QtWidgets.QLabel("Forgot Password?")
         title.setAlignment(QtCore.Qt.AlignmentFlag.AlignCenter)
-        title.setStyleSheet("""
-            font-size: 24px;
-            font-weight: bold;
-            color: #2c3e50;
-            margin-bottom: 10px;
-        """)
+        title.setObjectName("title")
         layout.addWidget(title)
         
         # Description
@@ -55,96 +170,36 @@ class ForgotPasswordDialog(QtWidgets.QDialog):
         """)
         description.setAlignment(QtCore.Qt.AlignmentFlag.AlignCenter)
         description.setWordWrap(True)
-        description.setStyleSheet("""
-            font-size: 14px;
-            color: #7f8c8d;
-            margin-bottom: 20px;
-        """)
+        description.setObjectName("description")
         layout.addWidget(description)
         
         # Input field
         self.input_label = QtWidgets.QLabel("Username or Email:")
-        self.input_label.setStyleSheet("""
-            font-size: 14px;
-            font-weight: bold;
-            color: #34495e;
-        """)
+        self.input_label.setObjectName("inputLabel")
         layout.addWidget(self.input_label)
         
         self.input_field = QtWidgets.QLineEdit()
         self.input_field.setPlaceholderText("Enter your username or email address")
         self.input_field.setMinimumHeight(60)
-        self.input_field.setStyleSheet("""
-            QLineEdit {
-                padding: 15px;
-                border: 2px solid #bdc3c7;
-                border-radius: 8px;
-                font-size: 16px;
-                background-color: white;
-                color: black;
-                min-height: 20px;
-            }
-            QLineEdit:focus {
-                border-color: #3498db;
-                color: black;
-            }
-        """)
+        self.input_field.setObjectName("emailInput")
         layout.addWidget(self.input_field)
         
         # Status label
         self.status_label = QtWidgets.QLabel("")
         self.status_label.setAlignment(QtCore.Qt.AlignmentFlag.AlignCenter)
         self.status_label.setWordWrap(True)
-        self.status_label.setStyleSheet("""
-            font-size: 14px;
-            padding: 20px;
-            border-radius: 8px;
-            margin: 15px 0;
-            min-height: 30px;
-        """)
+        self.status_label.setObjectName("statusLabel")
         layout.addWidget(self.status_label)
         
         # Buttons
         button_layout = QtWidgets.QHBoxLayout()
         
         self.cancel_button = QtWidgets.QPushButton("Cancel")
-        self.cancel_button.setStyleSheet("""
-            QPushButton {
-                background-color: #95a5a6;
-                color: white;
-                border: none;
-                padding: 12px 24px;
-                border-radius: 8px;
-                font-size: 14px;
-                font-weight: bold;
-            }
-            QPushButton:hover {
-                background-color: #7f8c8d;
-            }
-            QPushButton:pressed {
-                background-color: #6c7b7d;
-            }
-        """)
+        self.cancel_button.setObjectName("cancelBtn")
         button_layout.addWidget(self.cancel_button)
         
         self.send_button = QtWidgets.QPushButton("Send Reset Link")
-        self.send_button.setStyleSheet("""
-            QPushButton {
-                background-color: #3498db;
-                color: white;
-                border: none;
-                padding: 12px 24px;
-                border-radius: 8px;
-                font-size: 14px;
-                font-weight: bold;
-            }
-            QPushButton:hover {
-                background-color: #2980b9;
-            }
-            QPushButton:pressed {
-                background-color: #21618c;
-            }
-        """)
+        self.send_button.setObjectName("sendBtn")
         button_layout.addWidget(self.send_button)
         
         layout.addLayout(button_layout)
@@ -160,39 +215,25 @@ class ForgotPasswordDialog(QtWidgets.QDialog):
         self.input_field.textChanged.connect(self._clear_status)
     
     def _apply_styling(self):
-        """Apply overall dialog styling"""
-        self.setStyleSheet("""
-            QDialog {
-                background-color: #f8f9fa;
-                border-radius: 10px;
-            }
-        """)
+        """Apply the dialog stylesheet"""
+        self.setStyleSheet(_DIALOG_QSS)
+    
+    def _set_status_state(self, state: str):
+        """Switch the status label style via its dynamic 'state' property"""
+        self.status_label.setProperty("state", state)
+        style = self.status_label.style()
+        style.unpolish(self.status_label)
+        style.polish(self.status_label)
     
     def _clear_status(self):
         """Clear status message"""
         self.status_label.setText("")
-        self.status_label.setStyleSheet("""
-            font-size: 12px;
-            padding: 10px;
-            border-radius: 5px;
-            margin: 10px 0;
-        """)
+        self._set_status_state("clear")
     
     def _show_status(self, message: str, is_error: bool = False):
         """Show status message"""
-        color = "#e74c3c" if is_error else "#27ae60"
-        background = "#fdf2f2" if is_error else "#f0f9f0"
-        
         self.status_label.setText(message)
-        self.status_label.setStyleSheet(f"""
-            font-size: 12px;
-            color: {color};
-            background-color: {background};
-            padding: 10px;
-            border-radius: 5px;
-            margin: 10px 0;
-            border: 1px solid {color};
-        """)
+        self._set_status_state("error" if is_error else "success")
     
     def _handle_send_reset(self):
         """Handle send reset link request"""
@@ -209,73 +250,54 @@ class ForgotPasswordDialog(QtWidgets.QDialog):
             self._show_status("No account found with that username or email address.", True)
             return
         
-        # Load user info to get email
-        import json
+        # Look up user info to get email
         try:
-            with open("users.json", 'r') as f:
-                users = json.load(f)
-            
-            user_email = None
-            username = None
-            for user_data in users.values():
-                if (user_data.get('username') == username_or_email or 
-                    user_data.get('email') == username_or_email):
-                    user_email = user_data.get('email')
-                    username = user_data.get('username')
-                    break
+            user = find_user(username_or_email) or {}
+            user_email = user.get('email')
+            username = user.get('username')
             
             if user_email and username:
-                # Send reset email (real email)
-                email_sent = send_reset_email(username, user_email, token)
+                # Send reset email (real email) off the GUI thread
+                self._show_status(f"📧 Sending password reset link to {user_email}...")
+                self._send_worker = _SendWorker(username, user_email, token)
+                self._send_worker.signals.finished.connect(self._on_email_sent)
+                QtCore.QThreadPool.globalInstance().start(self._send_worker)
                 
-                if email_sent:
-                    self._show_status(
-                        f"✅ Password reset link sent to {user_email}!\n\n"
-                        f"📧 Please check your email and click the link to reset your password.\n"
-                        f"⏰ The link will expire in 1 hour.\n\n"
-                        f"💡 If you don't see the email, check your spam folder."
-                    )
-                else:
-                    self._show_status(
-                        f"❌ Failed to send email to {user_email}.\n\n"
-                        f"Please check your email address and try again.\n"
-                        f"If the problem persists, contact support.",
-                        True
-                    )
-                
-                # Disable send button and start countdown timer
+                # Disable send button and start the cooldown
                 self.send_button.setEnabled(False)
-                self.send_countdown = 30  # 30 second cooldown
-                self._update_send_button_text()
-                
-                # Start countdown timer
-                self.send_timer = QtCore.QTimer()
-                self.send_timer.timeout.connect(self._update_countdown)
-                self.send_timer.start(1000)  # Update every second
+                resend_at = QtCore.QTime.currentTime().addSecs(SEND_COOLDOWN_SECONDS)
+                self.send_button.setText(f"Resend at {resend_at.toString('HH:mm:ss')}")
+                self.send_cooldown.start()
                 
-                # Timer will handle re-enabling the send button
+                # The cooldown timer re-enables the send button
             else:
                 self._show_status("Error retrieving user information.", True)
                 
         except Exception as e:
             self._show_status(f"Error: {str(e)}", True)
     
-    def _update_countdown(self):
-        """Update the countdown timer"""
-        self.send_countdown -= 1
-        self._update_send_button_text()
-        
-        if self.send_countdown <= 0:
-            self.send_timer.stop()
-            self.send_button.setEnabled(True)
-            self.send_button.setText("Send Reset Link")
-    
-    def _update_send_button_text(self):
-        """Update the send button text with countdown"""
-        if self.send_countdown > 0:
-            self.send_button.setText(f"Resend in {self.send_countdown}s")
+    def _on_email_sent(self, email_sent: bool, user_email: str):
+        """Show the result of a background reset email send"""
+        self._send_worker = None
+        if email_sent:
+            self._show_status(
+                f"✅ Password reset link sent to {user_email}!\n\n"
+                f"📧 Please check your email and click the link to reset your password.\n"
+                f"⏰ The link will expire in 1 hour.\n\n"
+                f"💡 If you don't see the email, check your spam folder."
+            )
         else:
-            self.send_button.setText("Send Reset Link")
+            self._show_status(
+                f"❌ Failed to send email to {user_email}.\n\n"
+                f"Please check your email address and try again.\n"
+                f"If the problem persists, contact support.",
+                True
+            )
+    
+    def _reenable_send(self):
+        """End the cooldown and allow another send"""
+        self.send_button.setEnabled(True)
+        self.send_button.setText("Send Reset Link")
     
 
 def show_forgot_password_dialog(parent=None):
@@ -5,23 +5,68 @@ Manages password reset tokens with database primary and JSON fallback
 """
 
 import json
+import logging
 import os
+import mmap
 import time
 import secrets
-import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional, Dict, Any
 from database_manager import (
-    is_database_available, save_reset_token_to_db, get_reset_token_from_db,
-    delete_reset_token_from_db, cleanup_expired_tokens_from_db
+    save_reset_token_to_db, get_reset_token_from_db,
+    consume_reset_token_from_db, cleanup_expired_tokens_from_db
 )
 from sync_manager import check_and_sync
+from store_utils import db_up, json_loads, atomic_write_json
 from email_service import send_reset_email
+from hybrid_user_manager import get_user, get_user_by_email, update_user_password
+
+log = logging.getLogger(__name__)
+
+# Snapshots at least this large are parsed straight from an mmap instead of a read() copy
+MMAP_THRESHOLD = 64 * 1024
+
+
+def _read_json_file(path: str):
+    """Parse a JSON file, memory-mapping it when it is large"""
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size < MMAP_THRESHOLD:
+            return json_loads(f.read())
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            with memoryview(mm) as view:
+                return json_loads(view)
+
+
+
+
+
+# Reset emails are sent off the caller's thread so SMTP latency never blocks token generation
+_EMAIL_EXEC = ThreadPoolExecutor(max_workers=4, thread_name_prefix="reset-mail")
+
+
+def _log_email_result(future, email: str):
+    """Done-callback for background send_reset_email calls"""
+    exc = future.exception()
+    if exc is not None:
+        log.warning("Failed to send password reset email to %s: %s", email, exc)
+    elif future.result():
+        log.info("Password reset email sent to %s", email)
+    else:
+        log.warning("Failed to send password reset email to %s", email)
+
 
 class HybridPasswordResetManager:
     """Manages password reset tokens with database primary and JSON fallback"""
     
     def __init__(self, reset_tokens_file: str = "reset_tokens.json"):
         self.reset_tokens_file = reset_tokens_file
+        
+        # Parsed reset tokens, reused until the file's (mtime_ns, size) changes
+        self._lock = threading.RLock()
+        self._cache: Dict[str, Any] = {}
+        self._cache_signature = None
+        
         self._ensure_reset_tokens_file()
     
     def _ensure_reset_tokens_file(self):
@@ -30,70 +75,101 @@ class HybridPasswordResetManager:
             with open(self.reset_tokens_file, 'w') as f:
                 json.dump({}, f)
     
-    def _load_reset_tokens_from_json(self) -> Dict[str, Any]:
-        """Load reset tokens from JSON file"""
+    def _file_signature(self, path: str):
+        """Return (mtime_ns, size) of a file, or None if it is missing"""
         try:
-            with open(self.reset_tokens_file, 'r') as f:
-                return json.load(f)
-        except (FileNotFoundError, json.JSONDecodeError):
-            return {}
+            st = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+    
+    def _load_reset_tokens_from_json(self) -> Dict[str, Any]:
+        """
+        Load reset tokens (cached until the file changes)
+        
+        Other modules read and write the same file, so every change is a full
+        snapshot write. Callers must not mutate the returned dict; changes go
+        through _write_op().
+        """
+        with self._lock:
+            signature = self._file_signature(self.reset_tokens_file)
+            if signature is not None and signature == self._cache_signature:
+                return self._cache
+            
+            try:
+                tokens = _read_json_file(self.reset_tokens_file)
+            except (FileNotFoundError, json.JSONDecodeError):
+                tokens = {}
+            
+            self._cache = tokens
+            self._cache_signature = signature
+            return tokens
     
     def _save_reset_tokens_to_json(self, tokens: Dict[str, Any]):
-        """Save reset tokens to JSON file"""
-        with open(self.reset_tokens_file, 'w') as f:
-            json.dump(tokens, f, indent=2)
+        """Write a full snapshot of the reset tokens"""
+        with self._lock:
+            atomic_write_json(self.reset_tokens_file, tokens)
+            self._cache = tokens
+            self._cache_signature = self._file_signature(self.reset_tokens_file)
+    
+    def _write_op(self, key: str, value: Optional[Dict[str, Any]] = None):
+        """
+        Set tokens[key] to value (or delete it if value is None) and save the snapshot
+        
+        The cached dict is copied first, so a failed write leaves the cache matching disk.
+        """
+        with self._lock:
+            tokens = dict(self._load_reset_tokens_from_json())
+            if value is None:
+                tokens.pop(key, None)
+            else:
+                tokens[key] = value
+            self._save_reset_tokens_to_json(tokens)
     
     def generate_reset_token(self, username_or_email: str, expiry_hours: int = 1) -> Optional[str]:
         """Generate a reset token for username or email"""
         # First, find the user
-        from hybrid_user_manager import get_user, get_user_by_email
-        
         user = get_user(username_or_email) or get_user_by_email(username_or_email)
         if not user:
-            print(f"❌ No user found with username or email: {username_or_email}")
+            log.warning("No user found with username or email: %s", username_or_email)
             return None
         
         username = user["username"]
         email = user["email"]
-        token = secrets.token_hex(32)
-        expiry = int(time.time()) + (expiry_hours * 3600)
+        token = secrets.token_urlsafe(32)  # 43 chars, fits the VARCHAR(64) token column
+        now = int(time.time())
+        expiry = now + (expiry_hours * 3600)
         
         # Check and sync before attempting database operations
         check_and_sync()
         
         # Try database first
-        if is_database_available():
+        if db_up():
             success = save_reset_token_to_db(username, email, token, expiry)
             if success:
-                print(f"✅ Reset token generated for '{username}' in database")
+                log.info("Reset token generated for %s in database", username)
                 return token
             else:
-                print(f"⚠️ Database token generation failed for '{username}', falling back to JSON")
+                log.warning("Database token generation failed for %s, falling back to JSON", username)
         
         # Fallback to JSON
-        tokens = self._load_reset_tokens_from_json()
-        tokens[token] = {
+        self._write_op(token, {
             "username": username,
             "email": email,
             "expiry": expiry,
-            "created": int(time.time())
-        }
-        self._save_reset_tokens_to_json(tokens)
-        print(f"✅ Reset token generated for '{username}' in JSON file")
+            "created": now
+        })
+        log.info("Reset token generated for %s in JSON file", username)
         
         # Try to sync immediately if database becomes available
         check_and_sync()
         
         # Send reset email only if database is available (online)
-        if is_database_available():
-            email_sent = send_reset_email(username, email, token)
-            if email_sent:
-                print(f"✅ Password reset email sent to {email}")
-            else:
-                print(f"⚠️ Failed to send password reset email to {email}")
+        if db_up():
+            future = _EMAIL_EXEC.submit(send_reset_email, username, email, token)
+            future.add_done_callback(lambda f: _log_email_result(f, email))
         else:
-            print(f"⚠️ Database offline - reset token stored in JSON, email not sent")
-            print(f"   Email will be sent when database comes online and sync occurs")
+            log.warning("Database offline - reset token stored in JSON, email will be sent after sync")
         
         return token
     
@@ -102,17 +178,17 @@ class HybridPasswordResetManager:
         current_time = int(time.time())
         
         # Try database first
-        if is_database_available():
+        if db_up():
             token_data = get_reset_token_from_db(token)
             if token_data:
-                print(f"✅ Reset token validated for '{token_data['username']}' in database")
+                log.info("Reset token validated for %s in database", token_data["username"])
                 return {
                     "username": token_data["username"],
                     "email": token_data["email"],
                     "expiry": token_data["expiry_timestamp"]
                 }
             else:
-                print(f"❌ Invalid or expired reset token in database")
+                log.warning("Invalid or expired reset token in database")
                 return None
         
         # Fallback to JSON
@@ -120,7 +196,7 @@ class HybridPasswordResetManager:
         if token in tokens:
             token_data = tokens[token]
             if token_data["expiry"] > current_time:
-                print(f"✅ Reset token validated for '{token_data['username']}' in JSON file")
+                log.info("Reset token validated for %s in JSON file", token_data["username"])
                 return {
                     "username": token_data["username"],
                     "email": token_data["email"],
@@ -128,85 +204,69 @@ class HybridPasswordResetManager:
                 }
             else:
                 # Remove expired token
-                del tokens[token]
-                self._save_reset_tokens_to_json(tokens)
-                print(f"❌ Expired reset token removed from JSON file")
+                self._write_op(token)
+                log.warning("Expired reset token removed from JSON file")
                 return None
         
-        print(f"❌ Invalid reset token")
+        log.warning("Invalid reset token")
         return None
     
     def reset_password(self, token: str, new_password: str) -> bool:
-        """Reset password using token"""
-        # Validate token first
-        token_data = self.validate_reset_token(token)
-        if not token_data:
-            return False
+        """Reset password using token
+        
+        The token is consumed before the password is updated, so it cannot
+        be replayed even if the update fails.
+        """
+        if db_up():
+            token_data = consume_reset_token_from_db(token)
+            if not token_data:
+                log.warning("Invalid or expired reset token in database")
+                return False
+        else:
+            with self._lock:
+                token_data = self.validate_reset_token(token)
+                if not token_data:
+                    return False
+                self._write_op(token)
         
         username = token_data["username"]
-        password_hash = hashlib.sha256(new_password.encode()).hexdigest()
         
         # Update password using hybrid user manager
-        from hybrid_user_manager import update_user_password
         success = update_user_password(username, new_password)
         
         if success:
-            # Delete the used token
-            self._delete_reset_token(token)
-            print(f"✅ Password reset successful for '{username}'")
+            log.info("Password reset successful for %s", username)
             return True
         else:
-            print(f"❌ Password reset failed for '{username}'")
+            log.warning("Password reset failed for %s", username)
             return False
     
-    def _delete_reset_token(self, token: str):
-        """Delete a reset token"""
-        # Try database first
-        if is_database_available():
-            success = delete_reset_token_from_db(token)
-            if success:
-                print(f"✅ Reset token deleted from database")
-                return
-            else:
-                print(f"⚠️ Database token deletion failed, falling back to JSON")
-        
-        # Fallback to JSON
-        tokens = self._load_reset_tokens_from_json()
-        if token in tokens:
-            del tokens[token]
-            self._save_reset_tokens_to_json(tokens)
-            print(f"✅ Reset token deleted from JSON file")
-    
     def cleanup_expired_tokens(self):
         """Clean up expired reset tokens"""
         # Try database first
-        if is_database_available():
+        if db_up():
             cleanup_expired_tokens_from_db()
-            print("✅ Expired reset tokens cleaned up in database")
+            log.info("Expired reset tokens cleaned up in database")
             return
         
-        # Fallback to JSON
-        tokens = self._load_reset_tokens_from_json()
-        current_time = int(time.time())
-        expired_tokens = []
-        
-        for token, data in tokens.items():
-            if current_time > data["expiry"]:
-                expired_tokens.append(token)
+        # Fallback to JSON: keep live tokens in one pass, write once
+        with self._lock:
+            tokens = self._load_reset_tokens_from_json()
+            current_time = int(time.time())
+            live = {token: data for token, data in tokens.items() if data["expiry"] >= current_time}
+            removed = len(tokens) - len(live)
+            if removed:
+                self._save_reset_tokens_to_json(live)
         
-        for token in expired_tokens:
-            del tokens[token]
-        
-        if expired_tokens:
-            self._save_reset_tokens_to_json(tokens)
-            print(f"✅ Cleaned up {len(expired_tokens)} expired reset tokens in JSON file")
+        if removed:
+            log.info("Cleaned up %s expired reset tokens in JSON file", removed)
         else:
-            print("ℹ️ No expired reset tokens found in JSON file")
+            log.info("No expired reset tokens found in JSON file")
     
     def get_token_info(self, token: str) -> Optional[Dict[str, Any]]:
         """Get information about a token without validating expiry"""
         # Try database first
-        if is_database_available():
+        if db_up():
             from database_manager import execute_database_query
             query = """
                 SELECT username, email, UNIX_TIMESTAMP(expiry) as expiry_timestamp, created_at 
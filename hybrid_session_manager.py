@@ -5,21 +5,50 @@ Manages sessions with database primary and JSON fallback
 """
 
 import json
+import logging
 import os
+import mmap
 import time
 import secrets
-from typing import Optional, Dict, Any
+import threading
+from typing import Optional, Dict, Any, Tuple
 from database_manager import (
-    is_database_available, save_session_to_db, get_session_from_db, 
+    save_session_to_db, extend_session_in_db,
     delete_session_from_db, cleanup_expired_tokens_from_db
 )
 from sync_manager import check_and_sync
+from store_utils import db_up, json_loads, atomic_write_json
+
+log = logging.getLogger(__name__)
+
+# Snapshots at least this large are parsed straight from an mmap instead of a read() copy
+MMAP_THRESHOLD = 64 * 1024
+
+# validate_session only persists a slid expiry once it moves by more than this many seconds
+SESSION_EXTEND_MIN_STEP = 60
+
+
+def _read_json_file(path: str):
+    """Parse a JSON file, memory-mapping it when it is large"""
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size < MMAP_THRESHOLD:
+            return json_loads(f.read())
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            with memoryview(mm) as view:
+                return json_loads(view)
+
 
 class HybridSessionManager:
     """Manages sessions with database primary and JSON fallback"""
     
     def __init__(self, sessions_file: str = "sessions.json"):
         self.sessions_file = sessions_file
+        
+        # Parsed sessions, reused until the file's (mtime_ns, size) changes
+        self._lock = threading.RLock()
+        self._cache: Dict[str, Any] = {}
+        self._cache_signature = None
+        
         self._ensure_sessions_file()
     
     def _ensure_sessions_file(self):
@@ -28,44 +57,85 @@ class HybridSessionManager:
             with open(self.sessions_file, 'w') as f:
                 json.dump({}, f)
     
-    def _load_sessions_from_json(self) -> Dict[str, Any]:
-        """Load sessions from JSON file"""
+    def _file_signature(self, path: str):
+        """Return (mtime_ns, size) of a file, or None if it is missing"""
         try:
-            with open(self.sessions_file, 'r') as f:
-                return json.load(f)
-        except (FileNotFoundError, json.JSONDecodeError):
-            return {}
+            st = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+    
+    def _load_sessions_from_json(self) -> Dict[str, Any]:
+        """
+        Load sessions (cached until the file changes)
+        
+        Other modules read and write the same file, so every change is a full
+        snapshot write. Callers must not mutate the returned dict; changes go
+        through _write_op().
+        """
+        with self._lock:
+            signature = self._file_signature(self.sessions_file)
+            if signature is not None and signature == self._cache_signature:
+                return self._cache
+            
+            try:
+                sessions = _read_json_file(self.sessions_file)
+            except (FileNotFoundError, json.JSONDecodeError):
+                sessions = {}
+            
+            self._cache = sessions
+            self._cache_signature = signature
+            return sessions
     
     def _save_sessions_to_json(self, sessions: Dict[str, Any]):
-        """Save sessions to JSON file"""
-        with open(self.sessions_file, 'w') as f:
-            json.dump(sessions, f, indent=2)
+        """Write a full snapshot of the sessions"""
+        with self._lock:
+            atomic_write_json(self.sessions_file, sessions)
+            self._cache = sessions
+            self._cache_signature = self._file_signature(self.sessions_file)
+    
+    def _write_op(self, key: str, value: Optional[Dict[str, Any]] = None):
+        """
+        Set sessions[key] to value (or delete it if value is None) and save the snapshot
+        
+        The cached dict is copied first, so a failed write leaves the cache matching disk.
+        """
+        with self._lock:
+            sessions = dict(self._load_sessions_from_json())
+            if value is None:
+                sessions.pop(key, None)
+            else:
+                sessions[key] = value
+            self._save_sessions_to_json(sessions)
+    
+    @staticmethod
+    def _token_matches(stored: str, token: str) -> bool:
+        """Constant-time token comparison (encoded, since compare_digest rejects non-ASCII str)"""
+        return secrets.compare_digest(stored.encode("utf-8"), token.encode("utf-8"))
     
     def create_session(self, username: str, duration: int = 3600) -> str:
         """Create a new session"""
-        token = secrets.token_hex(32)
+        token = secrets.token_urlsafe(32)  # 43 chars, fits the VARCHAR(64) token column
         expiry = int(time.time()) + duration
         
         # Check and sync before attempting database operations
         check_and_sync()
         
         # Try database first
-        if is_database_available():
+        if db_up():
             success = save_session_to_db(username, token, expiry)
             if success:
-                print(f"✅ Session created for '{username}' in database")
+                log.info("Session created for %s in database", username)
                 return token
             else:
-                print(f"⚠️ Database session creation failed for '{username}', falling back to JSON")
+                log.warning("Database session creation failed for %s, falling back to JSON", username)
         
         # Fallback to JSON
-        sessions = self._load_sessions_from_json()
-        sessions[username] = {
+        self._write_op(username, {
             "token": token,
             "expiry": expiry
-        }
-        self._save_sessions_to_json(sessions)
-        print(f"✅ Session created for '{username}' in JSON file")
+        })
+        log.info("Session created for %s in JSON file", username)
         
         # Try to sync immediately if database becomes available
         check_and_sync()
@@ -77,58 +147,55 @@ class HybridSessionManager:
         current_time = int(time.time())
         
         # Try database first
-        if is_database_available():
-            session_data = get_session_from_db(username, token)
-            if session_data:
-                # Extend session (sliding session)
-                new_expiry = current_time + 3600  # Extend by 1 hour
-                save_session_to_db(username, token, new_expiry)
-                print(f"✅ Session validated and extended for '{username}' in database")
+        if db_up():
+            # Validate and extend (sliding session) in a single UPDATE
+            new_expiry = current_time + 3600  # Extend by 1 hour
+            if extend_session_in_db(username, token, new_expiry, SESSION_EXTEND_MIN_STEP):
+                log.info("Session validated and extended for %s in database", username)
                 return True
             else:
-                print(f"❌ Invalid or expired session for '{username}' in database")
+                log.warning("Invalid or expired session for %s in database", username)
                 return False
         
         # Fallback to JSON
         sessions = self._load_sessions_from_json()
         if username in sessions:
             session_data = sessions[username]
-            if (session_data["token"] == token and 
+            if (self._token_matches(session_data["token"], token) and 
                 session_data["expiry"] > current_time):
                 
-                # Extend session (sliding session)
-                sessions[username]["expiry"] = current_time + 3600
-                self._save_sessions_to_json(sessions)
-                print(f"✅ Session validated and extended for '{username}' in JSON file")
+                # Extend session (sliding session), skipping writes that would barely move it
+                new_expiry = current_time + 3600
+                if new_expiry - session_data["expiry"] > SESSION_EXTEND_MIN_STEP:
+                    self._write_op(username, dict(session_data, expiry=new_expiry))
+                log.info("Session validated and extended for %s in JSON file", username)
                 return True
             else:
                 # Remove expired session
-                del sessions[username]
-                self._save_sessions_to_json(sessions)
-                print(f"❌ Invalid or expired session for '{username}' in JSON file")
+                self._write_op(username)
+                log.warning("Invalid or expired session for %s in JSON file", username)
                 return False
         
-        print(f"❌ No session found for '{username}'")
+        log.warning("No session found for %s", username)
         return False
     
     def end_session(self, username: str, token: str = None) -> bool:
         """End a session"""
         # Try database first
-        if is_database_available():
+        if db_up():
             success = delete_session_from_db(username, token)
             if success:
-                print(f"✅ Session ended for '{username}' in database")
+                log.info("Session ended for %s in database", username)
                 return True
             else:
-                print(f"⚠️ Database session deletion failed for '{username}', falling back to JSON")
+                log.warning("Database session deletion failed for %s, falling back to JSON", username)
         
         # Fallback to JSON
         sessions = self._load_sessions_from_json()
         if username in sessions:
-            if token is None or sessions[username]["token"] == token:
-                del sessions[username]
-                self._save_sessions_to_json(sessions)
-                print(f"✅ Session ended for '{username}' in JSON file")
+            if token is None or self._token_matches(sessions[username]["token"], token):
+                self._write_op(username)
+                log.info("Session ended for %s in JSON file", username)
                 return True
         
         return False
@@ -136,7 +203,7 @@ class HybridSessionManager:
     def get_session_info(self, username: str) -> Optional[Dict[str, Any]]:
         """Get session information"""
         # Try database first
-        if is_database_available():
+        if db_up():
             from database_manager import execute_database_query
             query = """
                 SELECT token, UNIX_TIMESTAMP(expiry) as expiry_timestamp, created_at 
@@ -169,28 +236,24 @@ class HybridSessionManager:
     def cleanup_expired_sessions(self):
         """Clean up expired sessions"""
         # Try database first
-        if is_database_available():
+        if db_up():
             cleanup_expired_tokens_from_db()
-            print("✅ Expired sessions cleaned up in database")
+            log.info("Expired sessions cleaned up in database")
             return
         
-        # Fallback to JSON
-        sessions = self._load_sessions_from_json()
-        current_time = int(time.time())
-        expired_users = []
-        
-        for username, session_data in sessions.items():
-            if session_data["expiry"] <= current_time:
-                expired_users.append(username)
-        
-        for username in expired_users:
-            del sessions[username]
+        # Fallback to JSON: keep live sessions in one pass, write once
+        with self._lock:
+            sessions = self._load_sessions_from_json()
+            current_time = int(time.time())
+            live = {username: data for username, data in sessions.items() if data["expiry"] > current_time}
+            removed = len(sessions) - len(live)
+            if removed:
+                self._save_sessions_to_json(live)
         
-        if expired_users:
-            self._save_sessions_to_json(sessions)
-            print(f"✅ Cleaned up {len(expired_users)} expired sessions in JSON file")
+        if removed:
+            log.info("Cleaned up %s expired sessions in JSON file", removed)
         else:
-            print("ℹ️ No expired sessions found in JSON file")
+            log.info("No expired sessions found in JSON file")
 
 # Global instance
 session_manager = HybridSessionManager()
@@ -217,8 +280,19 @@ def cleanup_expired_sessions():
     session_manager.cleanup_expired_sessions()
 
 # Remember Me functionality
+REMEMBER_ME_FILE = "remember_me.json"
+
+# Parsed remember_me.json and the (mtime_ns, size) it was read at
+_RM_CACHE: Optional[Dict[str, Any]] = None
+_RM_SIGNATURE: Optional[Tuple[int, int]] = None
+
+def _rm_signature(st: os.stat_result) -> Tuple[int, int]:
+    """(mtime_ns, size) of remember_me.json, matching the other JSON caches"""
+    return (st.st_mtime_ns, st.st_size)
+
 def save_remember_me(username: str, token: str):
     """Save remember me data"""
+    global _RM_CACHE, _RM_SIGNATURE
     remember_data = {
         "username": username,
         "token": token,
@@ -226,28 +300,48 @@ def save_remember_me(username: str, token: str):
     }
     
     try:
-        with open("remember_me.json", 'w') as f:
-            json.dump(remember_data, f, indent=2)
-        print(f"✅ Remember me data saved for '{username}'")
+        atomic_write_json(REMEMBER_ME_FILE, remember_data)
+        _RM_CACHE = remember_data
+        _RM_SIGNATURE = _rm_signature(os.stat(REMEMBER_ME_FILE))
+        log.info("Remember me data saved for %s", username)
     except Exception as e:
-        print(f"❌ Failed to save remember me data: {e}")
+        _RM_CACHE = _RM_SIGNATURE = None
+        log.warning("Failed to save remember me data: %s", e)
 
 def load_remember_me() -> Optional[Dict[str, Any]]:
-    """Load remember me data"""
+    """Load remember me data (re-read only when the file changes); returns a copy"""
+    global _RM_CACHE, _RM_SIGNATURE
     try:
-        with open("remember_me.json", 'r') as f:
-            return json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
+        signature = _rm_signature(os.stat(REMEMBER_ME_FILE))
+    except FileNotFoundError:
+        _RM_CACHE = _RM_SIGNATURE = None
         return None
+    
+    if signature == _RM_SIGNATURE:
+        return dict(_RM_CACHE) if _RM_CACHE is not None else None
+    
+    try:
+        with open(REMEMBER_ME_FILE, 'rb') as f:
+            remember_data = json_loads(f.read())
+    except (FileNotFoundError, json.JSONDecodeError):
+        remember_data = None
+    
+    _RM_CACHE = remember_data
+    _RM_SIGNATURE = signature
+    return dict(remember_data) if remember_data is not None else None
 
 def clear_remember_me():
     """Clear remember me data"""
+    global _RM_CACHE, _RM_SIGNATURE
+    _RM_CACHE = _RM_SIGNATURE = None
     try:
-        if os.path.exists("remember_me.json"):
-            os.remove("remember_me.json")
-        print("✅ Remember me data cleared")
+        os.remove(REMEMBER_ME_FILE)
+    except FileNotFoundError:
+        pass
     except Exception as e:
-        print(f"❌ Failed to clear remember me data: {e}")
+        log.warning("Failed to clear remember me data: %s", e)
+        return
+    log.info("Remember me data cleared")
 
 def auto_login_from_remember() -> Optional[tuple]:
     """Auto-login from remember me data"""
@@ -263,12 +357,12 @@ def auto_login_from_remember() -> Optional[tuple]:
     
     # Validate the remembered session
     if validate_session(username, token):
-        print(f"✅ Auto-login successful for '{username}'")
+        log.info("Auto-login successful for %s", username)
         return (username, token)
     else:
         # Clear invalid remember me data
         clear_remember_me()
-        print(f"❌ Auto-login failed for '{username}', remember me data cleared")
+        log.warning("Auto-login failed for %s, remember me data cleared", username)
         return None
 
 if __name__ == "__main__":
@@ -5,20 +5,74 @@ Manages users with database primary and JSON fallback
 """
 
 import json
+import logging
 import os
-import hashlib
-from typing import Optional, Dict, Any
+import threading
+import time
+import functools
+from enum import IntEnum
+from typing import Optional, Dict, Any, List, Tuple, Iterator
 from database_manager import (
-    is_database_available, save_user_to_db, get_user_from_db, 
-    get_user_by_email_from_db
+    execute_database_query, iter_database_query, save_user_to_db,
+    save_users_to_db_bulk, get_user_from_db, get_user_by_email_from_db
 )
 from sync_manager import check_and_sync
+from store_utils import db_up, atomic_write_json
+from password_hashing import hash_password, verify_password, needs_rehash
+
+
+log = logging.getLogger(__name__)
+
+
+# check_and_sync() runs at most once per SYNC_CHECK_INTERVAL seconds from the hot paths
+SYNC_CHECK_INTERVAL = 5.0
+_last_sync_check = 0.0
+_sync_check_lock = threading.Lock()
+
+
+def _maybe_sync(force: bool = False):
+    """Call check_and_sync() unless it already ran within SYNC_CHECK_INTERVAL
+    
+    force=True always runs it; the follow-up after a JSON fallback write
+    must not be swallowed by the pre-write check that started the window.
+    """
+    global _last_sync_check
+    with _sync_check_lock:
+        now = time.monotonic()
+        if not force and _last_sync_check and now - _last_sync_check < SYNC_CHECK_INTERVAL:
+            return
+        _last_sync_check = now
+    check_and_sync()
+
+
+_verify_password = verify_password
+
+# Memoize (stored hash, password) checks so repeated logins skip the slow KDF. Off by
+# default because the cache keeps plaintext passwords in memory; set ZACH_CACHE_PW_HASH=1 to enable.
+if os.environ.get("ZACH_CACHE_PW_HASH") == "1":
+    _verify_password = functools.lru_cache(maxsize=1024)(verify_password)
+
+
+class AuthResult(IntEnum):
+    """Outcome of HybridUserManager.authenticate()"""
+    OK = 0
+    WRONG_PASSWORD = 1
+    UNKNOWN_USER = 2
+
 
 class HybridUserManager:
     """Manages users with database primary and JSON fallback"""
     
     def __init__(self, users_file: str = "users.json"):
         self.users_file = users_file
+        
+        # Parsed users.json, reused until the file's (mtime_ns, size) changes
+        self._lock = threading.RLock()
+        self._cache: Dict[str, Any] = {}
+        self._cache_signature = None
+        self._by_email: Optional[Dict[str, str]] = None       # lowercase email -> username
+        self._by_lower_name: Optional[Dict[str, str]] = None  # lowercase username -> username
+        
         self._ensure_users_file()
     
     def _ensure_users_file(self):
@@ -27,54 +81,137 @@ class HybridUserManager:
             with open(self.users_file, 'w') as f:
                 json.dump({}, f)
     
-    def _load_users_from_json(self) -> Dict[str, Any]:
-        """Load users from JSON file"""
+    def _file_signature(self):
+        """Return (mtime_ns, size) of the JSON file, or None if it is missing"""
         try:
-            with open(self.users_file, 'r') as f:
-                return json.load(f)
-        except (FileNotFoundError, json.JSONDecodeError):
-            return {}
+            st = os.stat(self.users_file)
+        except FileNotFoundError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+    
+    def _load_users_from_json(self) -> Dict[str, Any]:
+        """Load users from JSON file (cached until the file changes)
+        
+        The returned dict is the cache itself: callers must not mutate it.
+        Writers copy it, change the copy and hand that to _save_users_to_json.
+        """
+        with self._lock:
+            signature = self._file_signature()
+            if signature is not None and signature == self._cache_signature:
+                return self._cache
+            
+            try:
+                with open(self.users_file, 'r') as f:
+                    data = json.load(f)
+            except (FileNotFoundError, json.JSONDecodeError):
+                data = {}
+            
+            self._cache = data
+            self._cache_signature = signature
+            self._by_email = None
+            self._by_lower_name = None
+            return data
     
     def _save_users_to_json(self, users: Dict[str, Any]):
         """Save users to JSON file"""
-        with open(self.users_file, 'w') as f:
-            json.dump(users, f, indent=2)
+        with self._lock:
+            atomic_write_json(self.users_file, users)
+            self._cache = users
+            self._cache_signature = self._file_signature()
+            self._by_email = None
+            self._by_lower_name = None
+    
+    def _build_indexes(self, users: Dict[str, Any]):
+        """Build the email and case-insensitive username indexes for the cached users"""
+        by_email = {}
+        by_lower_name = {}
+        for stored_username, user_data in users.items():
+            # setdefault keeps the first match, like the linear scans these replace
+            by_lower_name.setdefault(stored_username.lower(), stored_username)
+            email = user_data.get("email")
+            if email:
+                by_email.setdefault(email.lower(), stored_username)
+        self._by_email = by_email
+        self._by_lower_name = by_lower_name
+    
+    def _find_json_user(self, index: str, key: str) -> Optional[Dict[str, Any]]:
+        """Look up a JSON user through the "email" or "name" index"""
+        with self._lock:
+            users = self._load_users_from_json()
+            if self._by_email is None:
+                self._build_indexes(users)
+            by_key = self._by_email if index == "email" else self._by_lower_name
+            stored_username = by_key.get(key.lower())
+            user = users.get(stored_username) if stored_username is not None else None
+            return dict(user) if user is not None else None
     
     def save_user(self, username: str, email: str, password: str) -> bool:
         """Save user with database primary, JSON fallback"""
-        password_hash = hashlib.sha256(password.encode()).hexdigest()
+        password_hash = hash_password(password)
         
         # Check and sync before attempting database operations
-        check_and_sync()
+        _maybe_sync()
         
         # Try database first
-        if is_database_available():
+        if db_up():
             success = save_user_to_db(username, email, password_hash)
             if success:
-                print(f"✅ User '{username}' saved to database")
+                log.info("User %s saved to database", username)
                 return True
             else:
-                print(f"⚠️ Database save failed for '{username}', falling back to JSON")
+                log.warning("Database save failed for %s, falling back to JSON", username)
         
-        # Fallback to JSON
-        users = self._load_users_from_json()
+        # Fallback to JSON (copy so the cache only changes once the write lands)
+        users = dict(self._load_users_from_json())
         users[username] = {
             "username": username,
             "email": email,
             "password": password_hash
         }
         self._save_users_to_json(users)
-        print(f"✅ User '{username}' saved to JSON file")
+        log.info("User %s saved to JSON file", username)
         
         # Try to sync immediately if database becomes available
-        check_and_sync()
+        _maybe_sync(force=True)
+        
+        return True
+    
+    def save_users_bulk(self, users: List[Tuple[str, str, str]]) -> bool:
+        """Save many (username, email, password) users with one DB insert or one JSON write"""
+        # Salted hashes are per user; sharing one across users would reveal equal passwords
+        rows = [(username, email, hash_password(password)) for username, email, password in users]
+        
+        # Check and sync before attempting database operations
+        _maybe_sync()
+        
+        # Try database first
+        if db_up():
+            success = save_users_to_db_bulk(rows)
+            if success:
+                log.info("%s users saved to database", len(rows))
+                return True
+            else:
+                log.warning("Database bulk save failed for %s users, falling back to JSON", len(rows))
+        
+        # Fallback to JSON
+        with self._lock:
+            stored = dict(self._load_users_from_json())
+            stored.update({
+                username: {"username": username, "email": email, "password": password_hash}
+                for username, email, password_hash in rows
+            })
+            self._save_users_to_json(stored)
+        log.info("%s users saved to JSON file", len(rows))
+        
+        # Try to sync immediately if database becomes available
+        _maybe_sync(force=True)
         
         return True
     
     def get_user(self, username: str) -> Optional[Dict[str, Any]]:
         """Get user with database primary, JSON fallback"""
         # Try database first
-        if is_database_available():
+        if db_up():
             user = get_user_from_db(username)
             if user:
                 return {
@@ -84,13 +221,13 @@ class HybridUserManager:
                 }
         
         # Fallback to JSON
-        users = self._load_users_from_json()
-        return users.get(username)
+        user = self._load_users_from_json().get(username)
+        return dict(user) if user is not None else None
     
     def get_user_by_email(self, email: str) -> Optional[Dict[str, Any]]:
         """Get user by email with database primary, JSON fallback"""
         # Try database first
-        if is_database_available():
+        if db_up():
             user = get_user_by_email_from_db(email)
             if user:
                 return {
@@ -100,20 +237,15 @@ class HybridUserManager:
                 }
         
         # Fallback to JSON
-        users = self._load_users_from_json()
-        for user_data in users.values():
-            if user_data.get("email") == email:
-                return user_data
-        return None
+        return self._find_json_user("email", email)
     
     def get_user_case_insensitive(self, username: str) -> Optional[Dict[str, Any]]:
         """Get user by case-insensitive username lookup"""
         # Try database first
-        if is_database_available():
-            from database_manager import execute_database_query
-            # Use LOWER() function for case-insensitive comparison
+        if db_up():
+            # username_lower is an indexed generated column, so this is an index probe
             result = execute_database_query(
-                "SELECT username, email, password_hash FROM users WHERE LOWER(username) = LOWER(%s)",
+                "SELECT username, email, password_hash FROM users WHERE username_lower = LOWER(%s)",
                 (username,), fetch=True
             )
             if result:
@@ -125,29 +257,62 @@ class HybridUserManager:
                 }
         
         # Fallback to JSON - case-insensitive lookup
-        users = self._load_users_from_json()
-        username_lower = username.lower()
-        for stored_username, user_data in users.items():
-            if stored_username.lower() == username_lower:
-                return user_data
-        return None
+        return self._find_json_user("name", username)
     
     def user_exists(self, username: str) -> bool:
         """Check if user exists"""
-        return self.get_user(username) is not None
+        # Try database first (existence only, no row materialized)
+        if db_up():
+            if execute_database_query("SELECT 1 FROM users WHERE username = %s LIMIT 1", (username,), fetch=True):
+                return True
+        
+        # Fallback to JSON
+        return username in self._load_users_from_json()
     
     def email_exists(self, email: str) -> bool:
         """Check if email exists"""
-        return self.get_user_by_email(email) is not None
+        # Try database first (existence only, no row materialized)
+        if db_up():
+            if execute_database_query("SELECT 1 FROM users WHERE email = %s LIMIT 1", (email,), fetch=True):
+                return True
+        
+        # Fallback to JSON
+        return self._find_json_user("email", email) is not None
     
-    def validate_user(self, username: str, password: str) -> bool:
-        """Validate user credentials"""
-        user = self.get_user(username)
-        if not user:
+    def _check_password(self, user: Dict[str, Any], password: str) -> bool:
+        """Verify a password against a user record, upgrading legacy hashes on success"""
+        stored = user["password"]
+        # Hybrid records were only ever hashed, so plain-text matches are never accepted
+        if not _verify_password(stored, password, allow_plain=False):
             return False
         
-        password_hash = hashlib.sha256(password.encode()).hexdigest()
-        return user["password"] == password_hash
+        if needs_rehash(stored):
+            # Only a SHA-256 digest or outdated Argon2 hash can get here; replace it
+            self.update_user_password(user["username"], password)
+        return True
+    
+    def authenticate(self, username: str, password: str,
+                     case_insensitive: bool = False) -> tuple[AuthResult, Optional[str]]:
+        """Look the user up once and check the password
+        
+        Returns:
+            tuple: (result, actual_username) - actual_username is None unless the user exists
+        """
+        if case_insensitive:
+            user = self.get_user_case_insensitive(username)
+        else:
+            user = self.get_user(username)
+        if not user:
+            return AuthResult.UNKNOWN_USER, None
+        
+        if not self._check_password(user, password):
+            return AuthResult.WRONG_PASSWORD, user["username"]
+        return AuthResult.OK, user["username"]
+    
+    def validate_user(self, username: str, password: str) -> bool:
+        """Validate user credentials"""
+        result, _ = self.authenticate(username, password)
+        return result == AuthResult.OK
     
     def validate_user_case_insensitive(self, username: str, password: str) -> tuple[bool, Optional[str]]:
         """Validate user credentials with case-insensitive username lookup
@@ -155,20 +320,38 @@ class HybridUserManager:
         Returns:
             tuple: (is_valid, actual_username)
         """
-        user = self.get_user_case_insensitive(username)
-        if not user:
+        result, actual_username = self.authenticate(username, password, case_insensitive=True)
+        if result != AuthResult.OK:
             return False, None
+        return True, actual_username
+    
+    def iter_all_users(self) -> Iterator[Dict[str, Any]]:
+        """Stream all users as {"username", "email", "created_at"} dicts (for admin/export)"""
+        # Try database first
+        if db_up():
+            found = False
+            for user in iter_database_query("SELECT username, email, created_at FROM users"):
+                found = True
+                yield {
+                    "username": user["username"],
+                    "email": user["email"],
+                    "created_at": user["created_at"].isoformat() if user["created_at"] else None
+                }
+            if found:
+                return
         
-        password_hash = hashlib.sha256(password.encode()).hexdigest()
-        is_valid = user["password"] == password_hash
-        actual_username = user["username"] if is_valid else None
-        return is_valid, actual_username
+        # Fallback to JSON
+        for user in list(self._load_users_from_json().values()):
+            yield {
+                "username": user.get("username"),
+                "email": user.get("email"),
+                "created_at": user.get("created_at")
+            }
     
-    def get_all_users(self) -> Dict[str, Any]:
+    def get_all_users_dict(self) -> Dict[str, Any]:
         """Get all users (for admin purposes)"""
         # Try database first
-        if is_database_available():
-            from database_manager import execute_database_query
+        if db_up():
             result = execute_database_query("SELECT username, email, created_at FROM users", fetch=True)
             if result:
                 users = {}
@@ -181,27 +364,28 @@ class HybridUserManager:
                 return users
         
         # Fallback to JSON
-        return self._load_users_from_json()
+        return {username: dict(user) for username, user in self._load_users_from_json().items()}
+    
+    get_all_users = get_all_users_dict  # Backwards-compatible name
     
     def update_user_password(self, username: str, new_password: str) -> bool:
         """Update user password"""
-        password_hash = hashlib.sha256(new_password.encode()).hexdigest()
+        password_hash = hash_password(new_password)
         
         # Try database first
-        if is_database_available():
-            from database_manager import execute_database_query
+        if db_up():
             query = "UPDATE users SET password_hash = %s WHERE username = %s"
             result = execute_database_query(query, (password_hash, username))
             if result:
-                print(f"✅ Password updated for '{username}' in database")
+                log.info("Password updated for %s in database", username)
                 return True
         
         # Fallback to JSON
-        users = self._load_users_from_json()
+        users = dict(self._load_users_from_json())
         if username in users:
-            users[username]["password"] = password_hash
+            users[username] = {**users[username], "password": password_hash}
             self._save_users_to_json(users)
-            print(f"✅ Password updated for '{username}' in JSON file")
+            log.info("Password updated for %s in JSON file", username)
             return True
         
         return False
@@ -209,20 +393,19 @@ class HybridUserManager:
     def delete_user(self, username: str) -> bool:
         """Delete user"""
         # Try database first
-        if is_database_available():
-            from database_manager import execute_database_query
+        if db_up():
             query = "DELETE FROM users WHERE username = %s"
             result = execute_database_query(query, (username,))
             if result:
-                print(f"✅ User '{username}' deleted from database")
+                log.info("User %s deleted from database", username)
                 return True
         
         # Fallback to JSON
-        users = self._load_users_from_json()
+        users = dict(self._load_users_from_json())
         if username in users:
             del users[username]
             self._save_users_to_json(users)
-            print(f"✅ User '{username}' deleted from JSON file")
+            log.info("User %s deleted from JSON file", username)
             return True
         
         return False
@@ -235,6 +418,10 @@ def save_user(username: str, email: str, password: str) -> bool:
     """Save user with hybrid system"""
     return user_manager.save_user(username, email, password)
 
+def save_users_bulk(users: List[Tuple[str, str, str]]) -> bool:
+    """Save many (username, email, password) users with hybrid system"""
+    return user_manager.save_users_bulk(users)
+
 def get_user(username: str) -> Optional[Dict[str, Any]]:
     """Get user with hybrid system"""
     return user_manager.get_user(username)
@@ -255,6 +442,10 @@ def validate_user(username: str, password: str) -> bool:
     """Validate user credentials"""
     return user_manager.validate_user(username, password)
 
+def authenticate(username: str, password: str, case_insensitive: bool = False) -> tuple[AuthResult, Optional[str]]:
+    """Look up a user and check the password in one call"""
+    return user_manager.authenticate(username, password, case_insensitive)
+
 def update_user_password(username: str, new_password: str) -> bool:
     """Update user password"""
     return user_manager.update_user_password(username, new_password)
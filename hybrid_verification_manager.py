@@ -4,23 +4,85 @@ Hybrid Verification Manager
 Manages email verification with database primary and JSON fallback
 """
 
+import hashlib
+import hmac
 import json
+import logging
 import os
+import threading
 import time
 import secrets
-from typing import Optional, Dict, Any
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, Any, List, Tuple
 from database_manager import (
-    is_database_available, save_verification_token_to_db, get_verification_token_from_db,
-    mark_verification_token_verified, is_user_verified_in_db
+    execute_database_query, save_verification_token_to_db,
+    save_verification_tokens_to_db_bulk, get_verification_token_from_db, mark_verification_token_verified, is_user_verified_in_db,
+    cleanup_expired_verification_tokens_from_db
 )
 from sync_manager import check_and_sync
+from store_utils import db_up, atomic_write_json
 from email_service import send_verification_email
 
+
+log = logging.getLogger(__name__)
+
+
+# check_and_sync() runs at most once per SYNC_CHECK_INTERVAL seconds from the hot paths
+SYNC_CHECK_INTERVAL = 5.0
+_last_sync_check = 0.0
+_sync_check_lock = threading.Lock()
+
+
+def _maybe_sync(force: bool = False):
+    """Call check_and_sync() unless it already ran within SYNC_CHECK_INTERVAL
+    
+    force=True always runs it; the follow-up after a JSON fallback write
+    must not be swallowed by the pre-write check that started the window.
+    """
+    global _last_sync_check
+    with _sync_check_lock:
+        now = time.monotonic()
+        if not force and _last_sync_check and now - _last_sync_check < SYNC_CHECK_INTERVAL:
+            return
+        _last_sync_check = now
+    check_and_sync()
+
+
+# Verification emails and the follow-up sync run off the caller's thread so
+# SMTP and database latency never block signup
+_BACKGROUND_EXEC = ThreadPoolExecutor(max_workers=4, thread_name_prefix="verify-io")
+
+
+def _token_matches(token_data: Dict[str, Any], token: str) -> bool:
+    """Constant-time token check; entries written by EmailVerificationManager keep only the SHA-256 hash"""
+    if "token_hash" in token_data:
+        stored, given = token_data["token_hash"], hashlib.sha256(token.encode("utf-8")).hexdigest()
+    else:
+        stored, given = token_data.get("token", ""), token
+    return hmac.compare_digest(stored.encode("utf-8"), given.encode("utf-8"))
+
+def _report_email_result(future, email: str):
+    """Done-callback for background send_verification_email calls"""
+    exc = future.exception()
+    if exc is not None:
+        log.warning("Failed to send verification email to %s: %s", email, exc)
+    elif future.result():
+        log.info("Verification email sent to %s", email)
+    else:
+        log.warning("Failed to send verification email to %s", email)
+
+
 class HybridVerificationManager:
     """Manages email verification with database primary and JSON fallback"""
     
     def __init__(self, verification_file: str = "verification.json"):
         self.verification_file = verification_file
+        
+        # Parsed verification.json, reused until the file's (mtime_ns, size) changes
+        self._lock = threading.RLock()
+        self._cache: Dict[str, Any] = {}
+        self._cache_signature = None
+        
         self._ensure_verification_file()
     
     def _ensure_verification_file(self):
@@ -29,106 +91,172 @@ class HybridVerificationManager:
             with open(self.verification_file, 'w') as f:
                 json.dump({}, f)
     
-    def _load_verification_from_json(self) -> Dict[str, Any]:
-        """Load verification data from JSON file"""
+    def _file_signature(self):
+        """Return (mtime_ns, size) of the JSON file, or None if it is missing"""
         try:
-            with open(self.verification_file, 'r') as f:
-                return json.load(f)
-        except (FileNotFoundError, json.JSONDecodeError):
-            return {}
+            st = os.stat(self.verification_file)
+        except FileNotFoundError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+    
+    def _load_verification_from_json(self) -> Dict[str, Any]:
+        """Load verification data from JSON file (cached until the file changes)
+        
+        The returned dict is the cache itself: callers must not mutate it.
+        Writers copy it under self._lock, change the copy and save that.
+        """
+        with self._lock:
+            signature = self._file_signature()
+            if signature is not None and signature == self._cache_signature:
+                return self._cache
+            
+            try:
+                with open(self.verification_file, 'r') as f:
+                    data = json.load(f)
+            except (FileNotFoundError, json.JSONDecodeError):
+                data = {}
+            
+            self._cache = data
+            self._cache_signature = signature
+            return data
     
     def _save_verification_to_json(self, verification: Dict[str, Any]):
         """Save verification data to JSON file"""
-        with open(self.verification_file, 'w') as f:
-            json.dump(verification, f, indent=2)
+        with self._lock:
+            atomic_write_json(self.verification_file, verification)
+            self._cache = verification
+            self._cache_signature = self._file_signature()
     
     def generate_verification_token(self, username: str, email: str, expiry_hours: int = 24) -> str:
         """Generate a verification token"""
-        token = secrets.token_hex(32)
+        token = secrets.token_urlsafe(32)  # 43 chars, fits the VARCHAR(64) token column
         expiry = int(time.time()) + (expiry_hours * 3600)
         
         # Check and sync before attempting database operations
-        check_and_sync()
+        _maybe_sync()
         
         # Try database first
-        if is_database_available():
+        if db_up():
             success = save_verification_token_to_db(username, email, token, expiry)
             if success:
-                print(f"✅ Verification token generated for '{username}' in database")
+                log.info("Verification token generated for %s in database", username)
                 return token
             else:
-                print(f"⚠️ Database token generation failed for '{username}', falling back to JSON")
+                log.warning("Database token generation failed for %s, falling back to JSON", username)
         
-        # Fallback to JSON
-        verification = self._load_verification_from_json()
-        verification[username] = {
-            "token": token,
-            "expiry": expiry,
-            "verified": False,
-            "email": email
-        }
-        self._save_verification_to_json(verification)
-        print(f"✅ Verification token generated for '{username}' in JSON file")
+        # Fallback to JSON (copy so the cache only changes once the write lands)
+        with self._lock:
+            verification = dict(self._load_verification_from_json())
+            verification[username] = {
+                "token": token,
+                "expiry": expiry,
+                "verified": False,
+                "email": email
+            }
+            self._save_verification_to_json(verification)
+        log.info("Verification token generated for %s in JSON file", username)
         
-        # Try to sync immediately if database becomes available
-        check_and_sync()
+        # Try to sync immediately if database becomes available, alongside the email send
+        _BACKGROUND_EXEC.submit(_maybe_sync, force=True)
         
-        # Send verification email
-        email_sent = send_verification_email(username, email, token)
-        if email_sent:
-            print(f"✅ Verification email sent to {email}")
-        else:
-            print(f"⚠️ Failed to send verification email to {email}")
+        # Send verification email in the background
+        future = _BACKGROUND_EXEC.submit(send_verification_email, username, email, token)
+        future.add_done_callback(lambda f: _report_email_result(f, email))
         
         return token
     
+    def generate_verification_tokens_bulk(self, users: List[Tuple[str, str]],
+                                          expiry_hours: int = 24) -> Dict[str, str]:
+        """Generate verification tokens for many (username, email) pairs at once
+        
+        Returns:
+            dict: username -> token
+        """
+        expiry = int(time.time()) + (expiry_hours * 3600)
+        rows = [(username, email, secrets.token_urlsafe(32), expiry) for username, email in users]
+        tokens = {username: token for username, _, token, _ in rows}
+        
+        # Check and sync before attempting database operations
+        _maybe_sync()
+        
+        # Try database first
+        if db_up():
+            success = save_verification_tokens_to_db_bulk(rows)
+            if success:
+                log.info("%s verification tokens generated in database", len(rows))
+                return tokens
+            else:
+                log.warning("Database bulk token generation failed for %s users, falling back to JSON", len(rows))
+        
+        # Fallback to JSON
+        with self._lock:
+            verification = dict(self._load_verification_from_json())
+            verification.update({
+                username: {"token": token, "expiry": expiry, "verified": False, "email": email}
+                for username, email, token, expiry in rows
+            })
+            self._save_verification_to_json(verification)
+        log.info("%s verification tokens generated in JSON file", len(rows))
+        
+        # Try to sync immediately if database becomes available, alongside the email send
+        _BACKGROUND_EXEC.submit(_maybe_sync, force=True)
+        
+        # Send verification emails in the background
+        for username, email, token, _ in rows:
+            future = _BACKGROUND_EXEC.submit(send_verification_email, username, email, token)
+            future.add_done_callback(lambda f, email=email: _report_email_result(f, email))
+        
+        return tokens
+    
     def verify_email(self, username: str, token: str) -> bool:
         """Verify email with token"""
         current_time = int(time.time())
         
         # Try database first
-        if is_database_available():
+        if db_up():
             token_data = get_verification_token_from_db(token)
             if token_data and token_data["username"] == username:
                 # Mark as verified
                 success = mark_verification_token_verified(token)
                 if success:
-                    print(f"✅ Email verified for '{username}' in database")
+                    log.info("Email verified for %s in database", username)
                     return True
             else:
-                print(f"❌ Invalid or expired verification token for '{username}' in database")
+                log.debug("Invalid or expired verification token for %s in database", username)
                 return False
         
         # Fallback to JSON
-        verification = self._load_verification_from_json()
-        if username in verification:
-            token_data = verification[username]
-            if (token_data["token"] == token and 
-                token_data["expiry"] > current_time and
-                not token_data["verified"]):
-                
-                # Mark as verified
-                verification[username]["verified"] = True
-                self._save_verification_to_json(verification)
-                print(f"✅ Email verified for '{username}' in JSON file")
-                return True
-            else:
-                print(f"❌ Invalid, expired, or already verified token for '{username}' in JSON file")
-                return False
+        with self._lock:
+            verification = self._load_verification_from_json()
+            if username in verification:
+                token_data = verification[username]
+                if (_token_matches(token_data, token) and 
+                    token_data["expiry"] > current_time and
+                    not token_data.get("verified", False)):
+                    
+                    # Mark as verified on a copy so the cached data only changes once the write lands
+                    verification = dict(verification)
+                    verification[username] = {**token_data, "verified": True}
+                    self._save_verification_to_json(verification)
+                    log.info("Email verified for %s in JSON file", username)
+                    return True
+                else:
+                    log.debug("Invalid, expired, or already verified token for %s in JSON file", username)
+                    return False
         
-        print(f"❌ No verification data found for '{username}'")
+        log.debug("No verification data found for %s", username)
         return False
     
     def is_verified(self, username: str) -> bool:
         """Check if user is verified"""
         # Try database first
-        if is_database_available():
+        if db_up():
             verified = is_user_verified_in_db(username)
             if verified:
-                print(f"✅ User '{username}' is verified in database")
+                log.info("User %s is verified in database", username)
                 return True
             else:
-                print(f"❌ User '{username}' is not verified in database")
+                log.debug("User %s is not verified in database", username)
                 return False
         
         # Fallback to JSON
@@ -138,14 +266,14 @@ class HybridVerificationManager:
             current_time = int(time.time())
             
             # Check if token is still valid and verified
-            if token_data["expiry"] > current_time and token_data["verified"]:
-                print(f"✅ User '{username}' is verified in JSON file")
+            if token_data["expiry"] > current_time and token_data.get("verified", False):
+                log.info("User %s is verified in JSON file", username)
                 return True
             else:
-                print(f"❌ User '{username}' is not verified or token expired in JSON file")
+                log.debug("User %s is not verified or token expired in JSON file", username)
                 return False
         
-        print(f"❌ No verification data found for '{username}'")
+        log.debug("No verification data found for %s", username)
         return False
     
     def resend_verification(self, username: str, email: str, expiry_hours: int = 24) -> str:
@@ -155,8 +283,7 @@ class HybridVerificationManager:
     def get_verification_info(self, username: str) -> Optional[Dict[str, Any]]:
         """Get verification information"""
         # Try database first
-        if is_database_available():
-            from database_manager import execute_database_query
+        if db_up():
             query = """
                 SELECT token, email, UNIX_TIMESTAMP(expiry) as expiry_timestamp, verified, created_at 
                 FROM verification_tokens 
@@ -177,11 +304,12 @@ class HybridVerificationManager:
         verification = self._load_verification_from_json()
         if username in verification:
             token_data = verification[username]
+            # Entries written by EmailVerificationManager have no plain token or email
             return {
-                "token": token_data["token"],
-                "email": token_data["email"],
+                "token": token_data.get("token"),
+                "email": token_data.get("email", ""),
                 "expiry": token_data["expiry"],
-                "verified": token_data["verified"],
+                "verified": token_data.get("verified", False),
                 "created_at": "Unknown"
             }
         
@@ -190,49 +318,43 @@ class HybridVerificationManager:
     def cleanup_expired_tokens(self):
         """Clean up expired verification tokens"""
         # Try database first
-        if is_database_available():
-            from database_manager import execute_database_query
-            query = "DELETE FROM verification_tokens WHERE expiry < NOW()"
-            execute_database_query(query)
-            print("✅ Expired verification tokens cleaned up in database")
+        if db_up():
+            removed = cleanup_expired_verification_tokens_from_db()
+            log.info("Cleaned up %s expired verification tokens in database", removed)
             return
         
-        # Fallback to JSON
-        verification = self._load_verification_from_json()
-        current_time = int(time.time())
-        expired_users = []
-        
-        for username, token_data in verification.items():
-            if token_data["expiry"] <= current_time:
-                expired_users.append(username)
-        
-        for username in expired_users:
-            del verification[username]
+        # Fallback to JSON: keep live tokens in one pass, write once
+        with self._lock:
+            verification = self._load_verification_from_json()
+            current_time = int(time.time())
+            kept = {u: t for u, t in verification.items() if t["expiry"] > current_time}
+            removed = len(verification) - len(kept)
+            if removed:
+                self._save_verification_to_json(kept)
         
-        if expired_users:
-            self._save_verification_to_json(verification)
-            print(f"✅ Cleaned up {len(expired_users)} expired verification tokens in JSON file")
+        if removed:
+            log.info("Cleaned up %s expired verification tokens in JSON file", removed)
         else:
-            print("ℹ️ No expired verification tokens found in JSON file")
+            log.info("No expired verification tokens found in JSON file")
     
     def get_verification_data(self, username: str) -> Optional[Dict[str, Any]]:
         """Get verification data for a user"""
         # Try database first
-        if is_database_available():
+        if db_up():
             try:
                 verification_data = get_verification_token_from_db(username)
                 if verification_data:
                     return verification_data
             except Exception as e:
-                print(f"⚠️ Database verification data retrieval failed for '{username}': {e}")
+                log.warning("Database verification data retrieval failed for %s: %s", username, e)
         
         # Fallback to JSON
         try:
             verification = self._load_verification_from_json()
             if username in verification:
-                return verification[username]
+                return dict(verification[username])
         except Exception as e:
-            print(f"⚠️ JSON verification data retrieval failed for '{username}': {e}")
+            log.warning("JSON verification data retrieval failed for %s: %s", username, e)
         
         return None
 
@@ -244,6 +366,10 @@ def generate_verification_token(username: str, email: str, expiry_hours: int = 2
     """Generate a verification token"""
     return verification_manager.generate_verification_token(username, email, expiry_hours)
 
+def generate_verification_tokens_bulk(users: List[Tuple[str, str]], expiry_hours: int = 24) -> Dict[str, str]:
+    """Generate verification tokens for many (username, email) pairs"""
+    return verification_manager.generate_verification_tokens_bulk(users, expiry_hours)
+
 def verify_email(username: str, token: str) -> bool:
     """Verify email with token"""
     return verification_manager.verify_email(username, token)
@@ -4,17 +4,65 @@ Login Verification Workflow Demo
 Demonstrates the new automatic email verification during login
 """
 
-import time
-import json
+import io
 import os
-from email_verification import (
-    verification_manager, 
-    generate_verification_token, 
-    verify_email, 
-    is_verified, 
-    send_verification_email_simulation,
-    cleanup_expired_verifications
-)
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from store_utils import json_loads, json_dumps
+
+# Parsed users files by path: (mtime_ns, size) -> data, so repeat calls skip the read
+_USERS_CACHE = {}
+
+# Banners, built once at import
+_BAR = "=" * 70
+_LOGIN_BANNER = f"{_BAR}\nLOGIN VERIFICATION WORKFLOW DEMO\n{_BAR}"
+_LOGIN_DONE_BANNER = f"\n{_BAR}\nLOGIN VERIFICATION WORKFLOW DEMO COMPLETE\n{_BAR}"
+_ERROR_BANNER = f"\n{_BAR}\nERROR SCENARIOS DEMO\n{_BAR}"
+_ERROR_DONE_BANNER = f"\n{_BAR}\nERROR SCENARIOS DEMO COMPLETE\n{_BAR}"
+_UI_BANNER = f"\n{_BAR}\nUI INTEGRATION DEMO\n{_BAR}"
+_UI_DONE_BANNER = f"\n{_BAR}\nUI INTEGRATION DEMO COMPLETE\n{_BAR}"
+_ALL_DONE_BANNER = f"\n{_BAR}\nALL DEMOS COMPLETE\n{_BAR}"
+
+# demo_ui_integration() output; it has no dynamic parts
+_UI_INTEGRATION_TEXT = f"""{_UI_BANNER}
+
+1. Login Page Changes:
+   ✅ Removed 'Verify Email' button
+   ✅ Verification now automatic during login
+
+2. Login Flow:
+   ✅ User enters username/password
+   ✅ System checks if email is verified
+   ✅ If not verified: shows modern popup
+   ✅ If verified: proceeds with login
+
+3. Verification Popup Features:
+   ✅ Modern, clean design
+   ✅ Shows username and email
+   ✅ 'Yes' and 'No' options
+   ✅ Automatic email sending
+   ✅ Success confirmation
+
+4. Session Management:
+   ✅ Works seamlessly with existing session system
+   ✅ Only verified users get sessions
+   ✅ Remember Me works for verified users
+{_UI_DONE_BANNER}
+"""
+
+
+def _flush(lines, stream=None):
+    """Write buffered output lines to stream (default stdout) in one call and empty the buffer"""
+    if lines:
+        (stream or sys.stdout).write("\n".join(lines) + "\n")
+        lines.clear()
+
+
+def _file_signature(path):
+    """Return (mtime_ns, size) of a file"""
+    st = os.stat(path)
+    return st.st_mtime_ns, st.st_size
+
 
 def create_test_user():
     """Create a test user for demonstration"""
@@ -22,190 +70,187 @@ def create_test_user():
     email = "test@example.com"
     password_hash = "hashed_password_123"  # In real app, this would be properly hashed
     
-    # Create users.json if it doesn't exist
-    users_file = "users.json"
-    if os.path.exists(users_file):
-        with open(users_file, "r", encoding="utf-8") as f:
-            data = json.load(f)
-    else:
-        data = {"users": {}}
-    
-    # Add test user
-    data["users"][username] = {
+    user = {
         "password": password_hash,
         "email": email
     }
     
-    with open(users_file, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2)
+    # Create users.json if it doesn't exist; a new file needs no read/merge
+    users_file = "users.json"
+    try:
+        fd = os.open(users_file, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    except FileExistsError:
+        # Reuse the last parse while the file is unchanged
+        cached = _USERS_CACHE.get(users_file)
+        if cached is not None and cached[0] == _file_signature(users_file):
+            data = dict(cached[1], users=dict(cached[1]["users"]))
+        else:
+            with open(users_file, "rb") as f:
+                data = json_loads(f.read())
+        
+        # Add test user, leaving the file alone if an identical record is already there
+        if data["users"].get(username) != user:
+            data["users"][username] = user
+            
+            # Encode once, write a temp file and swap it in so readers never see a partial file
+            tmp_path = users_file + ".tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(json_dumps(data, indent=True))
+            os.replace(tmp_path, users_file)
+    else:
+        data = {"users": {username: user}}
+        with os.fdopen(fd, "wb") as f:
+            f.write(json_dumps(data, indent=True))
+    _USERS_CACHE[users_file] = (_file_signature(users_file), data)
     
     print(f"✅ Created test user: {username} ({email})")
     return username, email
 
 def demo_login_workflow():
     """Demonstrate the complete login verification workflow"""
-    print("=" * 70)
-    print("LOGIN VERIFICATION WORKFLOW DEMO")
-    print("=" * 70)
-    
-    # Clean up any existing verifications
-    print("\n1. Cleaning up expired verifications...")
-    cleaned = cleanup_expired_verifications()
-    print(f"   Cleaned up {cleaned} expired verifications")
-    
-    # Create test user
-    print("\n2. Creating test user...")
-    username, email = create_test_user()
+    # Imported here so importing this module doesn't pull in the SMTP stack
+    from email_verification import (
+        verification_manager,
+        get_or_create_verification_token,
+        verify_email,
+        is_verified,
+        send_verification_email_simulation,
+        cleanup_expired_verifications
+    )
     
-    # Simulate user signup (creates verification token)
-    print(f"\n3. Simulating user signup...")
-    token = generate_verification_token(username, 24)
-    print(f"   Generated verification token: {token[:16]}...")
-    
-    # Send initial verification email
-    print(f"\n4. Sending initial verification email...")
-    if send_verification_email_simulation(username, email, token):
-        print("   ✅ Initial verification email sent")
-    else:
-        print("   ❌ Failed to send initial verification email")
-    
-    # Check verification status (should be unverified)
-    print(f"\n5. Checking verification status...")
-    if is_verified(username):
-        print("   ❌ User is verified (should not be)")
-    else:
-        print("   ✅ User is not verified (correct)")
-    
-    # Simulate login attempt (should trigger verification popup)
-    print(f"\n6. Simulating login attempt by unverified user...")
-    print("   This would normally show the verification popup in the UI")
-    print("   For demo purposes, we'll simulate the popup behavior:")
-    
-    # Simulate popup behavior
-    print(f"\n   📧 Verification popup would show:")
-    print(f"      Message: 'Your account {username} is not verified.'")
-    print(f"      Question: 'Would you like us to send a verification link to your email now?'")
-    print(f"      Email: {email}")
-    
-    # Simulate user clicking "Yes" in popup
-    print(f"\n   👆 User clicks 'Yes, Send Email'")
-    
-    # Generate new token (simulating popup behavior)
-    new_token = generate_verification_token(username, 24)
-    print(f"   Generated new verification token: {new_token[:16]}...")
-    
-    # Send verification email
-    if send_verification_email_simulation(username, email, new_token):
-        print("   ✅ Verification email sent successfully!")
-        print(f"   📧 Email sent to: {email}")
-    else:
-        print("   ❌ Failed to send verification email")
-    
-    # Simulate user verifying email
-    print(f"\n7. Simulating user clicking verification link...")
-    if verify_email(username, new_token):
-        print("   ✅ Email verified successfully!")
-    else:
-        print("   ❌ Email verification failed")
-    
-    # Check verification status (should be verified now)
-    print(f"\n8. Checking verification status after verification...")
-    if is_verified(username):
-        print("   ✅ User is now verified (correct)")
-    else:
-        print("   ❌ User is still not verified (incorrect)")
-    
-    # Simulate successful login attempt
-    print(f"\n9. Simulating login attempt after verification...")
-    print("   ✅ Login would now be allowed!")
-    print("   🎉 User successfully logged in")
+    # Keep verification changes in memory and write them once at the end
+    with verification_manager.defer_writes():
+        out = []
+        out.append(_LOGIN_BANNER)
+        
+        # Clean up any existing verifications
+        out.append("\n1. Cleaning up expired verifications...")
+        cleaned = cleanup_expired_verifications()
+        out.append(f"   Cleaned up {cleaned} expired verifications")
+        
+        # Create test user
+        out.append("\n2. Creating test user...")
+        _flush(out)
+        username, email = create_test_user()
+        
+        # Simulate user signup (creates verification token)
+        out.append(f"\n3. Simulating user signup...")
+        token = get_or_create_verification_token(username, 24)
+        out.append(f"   Generated verification token: {token[:16]}...")
+        
+        # Check verification status (should be unverified)
+        out.append(f"\n4. Checking verification status...")
+        if is_verified(username):
+            out.append("   ❌ User is verified (should not be)")
+        else:
+            out.append("   ✅ User is not verified (correct)")
+        
+        # Simulate login attempt (should trigger verification popup)
+        out.append(f"\n5. Simulating login attempt by unverified user...")
+        out.append("   This would normally show the verification popup in the UI")
+        out.append("   For demo purposes, we'll simulate the popup behavior:")
+        
+        # Simulate popup behavior
+        out.append(f"\n   📧 Verification popup would show:")
+        out.append(f"      Message: 'Your account {username} is not verified.'")
+        out.append(f"      Question: 'Would you like us to send a verification link to your email now?'")
+        out.append(f"      Email: {email}")
+        
+        # Simulate user clicking "Yes" in popup
+        out.append(f"\n   👆 User clicks 'Yes, Send Email'")
+        
+        # Reuse the pending token if still valid (simulating popup behavior)
+        new_token = get_or_create_verification_token(username, 24)
+        out.append(f"   Verification token: {new_token[:16]}...")
+        
+        # Send verification email
+        _flush(out)
+        if send_verification_email_simulation(username, email, new_token):
+            out.append("   ✅ Verification email sent successfully!")
+            out.append(f"   📧 Email sent to: {email}")
+        else:
+            out.append("   ❌ Failed to send verification email")
+        
+        # Simulate user verifying email
+        out.append(f"\n6. Simulating user clicking verification link...")
+        if verify_email(username, new_token):
+            out.append("   ✅ Email verified successfully!")
+        else:
+            out.append("   ❌ Email verification failed")
+        
+        # Check verification status (should be verified now)
+        out.append(f"\n7. Checking verification status after verification...")
+        if is_verified(username):
+            out.append("   ✅ User is now verified (correct)")
+        else:
+            out.append("   ❌ User is still not verified (incorrect)")
+        
+        # Simulate successful login attempt
+        out.append(f"\n8. Simulating login attempt after verification...")
+        out.append("   ✅ Login would now be allowed!")
+        out.append("   🎉 User successfully logged in")
+        
+        out.append(_LOGIN_DONE_BANNER)
+        _flush(out)
+
+def demo_error_scenarios(stream=None):
+    """Demonstrate error scenarios, writing to stream (default stdout)"""
+    from email_verification import verification_manager, verify_email, is_verified
     
-    print("\n" + "=" * 70)
-    print("LOGIN VERIFICATION WORKFLOW DEMO COMPLETE")
-    print("=" * 70)
-
-def demo_error_scenarios():
-    """Demonstrate error scenarios"""
-    print("\n" + "=" * 70)
-    print("ERROR SCENARIOS DEMO")
-    print("=" * 70)
+    out = []
+    out.append(_ERROR_BANNER)
     
     username = "testuser"
     
     # Test with wrong token
-    print(f"\n1. Testing verification with wrong token...")
+    out.append(f"\n1. Testing verification with wrong token...")
     wrong_token = "wrong_token_12345"
     if not verify_email(username, wrong_token):
-        print("   ✅ Wrong token correctly rejected")
+        out.append("   ✅ Wrong token correctly rejected")
     else:
-        print("   ❌ Wrong token incorrectly accepted")
+        out.append("   ❌ Wrong token incorrectly accepted")
     
     # Test with non-existent user
-    print(f"\n2. Testing verification with non-existent user...")
+    out.append(f"\n2. Testing verification with non-existent user...")
     if not verify_email("nonexistent_user", "any_token"):
-        print("   ✅ Non-existent user correctly rejected")
+        out.append("   ✅ Non-existent user correctly rejected")
     else:
-        print("   ❌ Non-existent user incorrectly accepted")
+        out.append("   ❌ Non-existent user incorrectly accepted")
     
     # Test login with unverified user (after clearing verification)
-    print(f"\n3. Testing login with unverified user...")
+    out.append(f"\n3. Testing login with unverified user...")
     # Clear verification status for testing
-    verifications = verification_manager._load_verifications()
-    if username in verifications:
-        verifications[username]["verified"] = False
-        verification_manager._save_verifications(verifications)
-        print(f"   Cleared verification status for {username}")
+    with verification_manager.bulk_update() as verifications:
+        if username in verifications:
+            verifications[username]["verified"] = False
+            out.append(f"   Cleared verification status for {username}")
     
     if not is_verified(username):
-        print("   ✅ Unverified user correctly blocked from login")
-        print("   📧 Verification popup would be shown")
+        out.append("   ✅ Unverified user correctly blocked from login")
+        out.append("   📧 Verification popup would be shown")
     else:
-        print("   ❌ Unverified user incorrectly allowed to login")
-    
-    print("\n" + "=" * 70)
-    print("ERROR SCENARIOS DEMO COMPLETE")
-    print("=" * 70)
-
-def demo_ui_integration():
-    """Demonstrate UI integration points"""
-    print("\n" + "=" * 70)
-    print("UI INTEGRATION DEMO")
-    print("=" * 70)
-    
-    print("\n1. Login Page Changes:")
-    print("   ✅ Removed 'Verify Email' button")
-    print("   ✅ Verification now automatic during login")
+        out.append("   ❌ Unverified user incorrectly allowed to login")
     
-    print("\n2. Login Flow:")
-    print("   ✅ User enters username/password")
-    print("   ✅ System checks if email is verified")
-    print("   ✅ If not verified: shows modern popup")
-    print("   ✅ If verified: proceeds with login")
-    
-    print("\n3. Verification Popup Features:")
-    print("   ✅ Modern, clean design")
-    print("   ✅ Shows username and email")
-    print("   ✅ 'Yes' and 'No' options")
-    print("   ✅ Automatic email sending")
-    print("   ✅ Success confirmation")
-    
-    print("\n4. Session Management:")
-    print("   ✅ Works seamlessly with existing session system")
-    print("   ✅ Only verified users get sessions")
-    print("   ✅ Remember Me works for verified users")
-    
-    print("\n" + "=" * 70)
-    print("UI INTEGRATION DEMO COMPLETE")
-    print("=" * 70)
+    out.append(_ERROR_DONE_BANNER)
+    _flush(out, stream)
+
+def demo_ui_integration(stream=None):
+    """Demonstrate UI integration points, writing to stream (default stdout)"""
+    (stream or sys.stdout).write(_UI_INTEGRATION_TEXT)
 
 if __name__ == "__main__":
     demo_login_workflow()
-    demo_error_scenarios()
-    demo_ui_integration()
     
-    print("\n" + "=" * 70)
-    print("ALL DEMOS COMPLETE")
-    print("=" * 70)
+    # The remaining demos only need the test user, so run them side by side
+    # into separate buffers and print those in order
+    error_out, ui_out = io.StringIO(), io.StringIO()
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        jobs = [pool.submit(demo_error_scenarios, error_out), pool.submit(demo_ui_integration, ui_out)]
+        for job in jobs:
+            job.result()
+    sys.stdout.write(error_out.getvalue() + ui_out.getvalue())
+    
+    print(_ALL_DONE_BANNER)
     print("\nTo test the new login verification system:")
     print("1. Run the main application: python main.py")
     print("2. Try to login with an unverified account")
@@ -214,4 +259,4 @@ if __name__ == "__main__":
     print("5. Check console for email simulation")
     print("6. Verify email using the verification dialog")
     print("7. Try logging in again - should work!")
-    print("=" * 70)
+    print(_BAR)
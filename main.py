@@ -1,58 +1,41 @@
-import sys, time, os, json, hashlib, re, datetime
+import sys, time, os, json, re, datetime, logging, functools, importlib
 from typing import Tuple
-from PyQt6 import QtWidgets, uic, QtCore, QtGui
+from PyQt6 import QtWidgets, QtCore, QtGui
+from password_hashing import verify_password
+from ui_loader import load_ui
 
-# Import session management
+# Login form precompiled by pyuic6 (pyuic6 Login.ui -o ui_login.py); parse Login.ui if it's missing
 try:
-    from session_manager import session_manager, create_session, validate_session, end_session, save_remember_me, clear_remember_me, auto_login_from_remember
+    from ui_login import Ui_Dialog as LoginForm
 except ImportError:
-    print("Warning: session_manager not found, session features disabled")
-    session_manager = None
+    LoginForm = None
 
-# Import email verification
-try:
-    from email_verification import verification_manager, is_verified, verify_email
-    from verification_popup import show_verification_popup, get_user_email
-except ImportError:
-    print("Warning: email_verification not found, email verification disabled")
-    verification_manager = None
+# The managers log per-request detail at INFO/DEBUG; only surface warnings and errors
+logging.basicConfig(level=logging.WARNING)
 
-# Import password reset functionality
-try:
-    from forgot_password_dialog import show_forgot_password_dialog
-    from reset_password_dialog import show_reset_password_dialog
-except ImportError:
-    print("Warning: password reset modules not found, forgot password disabled")
-    show_forgot_password_dialog = None
-    show_reset_password_dialog = None
+# Feature modules (sessions, verification, password reset, user manager, database
+# monitor, welcome and signup windows) are imported on first use, so the login
+# window is shown without loading them first
 
-# Import hybrid user manager for case-insensitive login
-try:
-    from hybrid_user_manager import user_manager, validate_user_credentials_case_insensitive
-except ImportError:
-    print("Warning: hybrid_user_manager not found, using fallback login system")
-    user_manager = None
 
-# Import database signal monitor with async support
-try:
-    from database_signal_monitor import DatabaseSignalButton, init_async_db_monitor
-except ImportError:
-    print("Warning: database_signal_monitor not found, database signal monitoring disabled")
-    DatabaseSignalButton = None
-    init_async_db_monitor = None
+@functools.lru_cache(maxsize=None)
+def _optional_import(module: str, warning: str):
+    """Import an optional module on first use; print the warning once and return None if it's missing"""
+    try:
+        return importlib.import_module(module)
+    except ImportError:
+        print(f"Warning: {warning}")
+        return None
 
-# Import the real Welcome window (do NOT define another WelcomeWindow here)
-# Ensure welcome.py is in the same directory as main.py, or adjust the import path if needed.
-try:
-    from welcome import WelcomeWindow
-except ModuleNotFoundError:
-    raise ImportError("Could not import 'WelcomeWindow' from 'welcome.py'. Make sure 'welcome.py' exists in the same directory as 'main.py'.")
 
-# Import SignupDialog from signup.py
-try:
-    from signup import SignupDialog
-except ModuleNotFoundError:
-    raise ImportError("Could not import 'SignupDialog' from 'signup.py'. Make sure 'signup.py' exists in the same directory as 'main.py'.")
+def _session_module():
+    """session_manager module, or None if session features are unavailable"""
+    return _optional_import("session_manager", "session_manager not found, session features disabled")
+
+
+def _user_module():
+    """hybrid_user_manager module, or None to fall back to users.json"""
+    return _optional_import("hybrid_user_manager", "hybrid_user_manager not found, using fallback login system")
 
 
 def ui_path(name: str) -> str:
@@ -64,10 +47,20 @@ def ui_path(name: str) -> str:
     except NameError:
         return name
 
+
 # ---- App & Login UI ----
 app = QtWidgets.QApplication(sys.argv)
 app.aboutToQuit.connect(lambda: print("DEBUG: Application is quitting"))
-window = uic.loadUi(ui_path("Login.ui"))
+if LoginForm is not None:
+    class LoginWindow(QtWidgets.QDialog, LoginForm):
+        """Login dialog built from the generated form; widgets are attributes, as with uic.loadUi"""
+        def __init__(self):
+            super().__init__()
+            self.setupUi(self)
+
+    window = LoginWindow()
+else:
+    window = load_ui(ui_path("Login.ui"))
 window.setWindowTitle("Login")
 
 # Disable login button initially
@@ -81,9 +74,13 @@ if hasattr(window, "Password"):
 # Database signal button setup - moved to function
 def initialize_db_monitor():
     """Initialize database monitoring in background thread."""
-    if not hasattr(window, "dbstrength") or not DatabaseSignalButton:
+    monitor = None
+    if hasattr(window, "dbstrength"):
+        monitor = _optional_import("database_signal_monitor", "database_signal_monitor not found, database signal monitoring disabled")
+    if not monitor:
         print("⚠️ Database signal button not found or monitor not available")
         return
+    DatabaseSignalButton, init_async_db_monitor = monitor.DatabaseSignalButton, monitor.init_async_db_monitor
 
     try:
         # Create button without initial connection test to avoid blocking startup
@@ -189,46 +186,77 @@ countdown_timer = QtCore.QTimer()
 # Remember-me
 REMEMBER_FILE = "remember.json"
 
+# Parsed state files by path: ((mtime_ns, size), value); writers below drop their entry
+_file_cache = {}
+
+
+def _cached_load(path: str, parse):
+    """
+    Return parse(path), reusing the previous result while the file's (mtime_ns, size)
+    is unchanged. Raises FileNotFoundError if the file is missing.
+    """
+    st = os.stat(path)
+    signature = (st.st_mtime_ns, st.st_size)
+    cached = _file_cache.get(path)
+    if cached is not None and cached[0] == signature:
+        return cached[1]
+    value = parse(path)
+    _file_cache[path] = (signature, value)
+    return value
+
+
+def _read_int(path: str) -> int:
+    with open(path) as f:
+        return int(f.read())
+
+
+def _read_json(path: str):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
 
 def load_users() -> dict:
     """
     Load users.json and return {username: {"password": "<hash-or-plain>", "email": "<email>"}}.
-    Handles both old structure and new hybrid structure.
+    Handles both old structure and new hybrid structure. The result is cached until
+    the file changes, so callers must not mutate it.
     """
-    path = ui_path("users.json")
-    if not os.path.exists(path):
-        return {}
     try:
-        with open(path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-        
-        result = {}
-        
-        # Check if it's the new hybrid structure (direct username keys)
-        if isinstance(data, dict) and data and not any(key == "users" for key in data.keys()):
-            # New hybrid structure: {username: {username, email, password}}
-            for uname, val in data.items():
-                if isinstance(val, dict):
-                    pw = val.get("password", "") or ""
-                    em = val.get("email", "") or ""
-                    result[uname] = {"password": pw, "email": em}
-        else:
-            # Old structure: {users: {username: {password, email}}}
-            raw = data.get("users", {}) if isinstance(data, dict) else {}
-            for uname, val in raw.items():
-                if isinstance(val, str):
-                    result[uname] = {"password": val, "email": ""}
-                elif isinstance(val, dict):
-                    pw = val.get("password", "") or ""
-                    em = val.get("email", "") or ""
-                    result[uname] = {"password": pw, "email": em}
-        
-        return result
+        return _cached_load(ui_path("users.json"), _parse_users)
+    except FileNotFoundError:
+        return {}
     except Exception as e:
         print("Warning: failed to load users.json:", e)
         return {}
 
 
+def _parse_users(path: str) -> dict:
+    data = _read_json(path)
+    
+    result = {}
+        
+    # Check if it's the new hybrid structure (direct username keys)
+    if isinstance(data, dict) and data and not any(key == "users" for key in data.keys()):
+        # New hybrid structure: {username: {username, email, password}}
+        for uname, val in data.items():
+            if isinstance(val, dict):
+                pw = val.get("password", "") or ""
+                em = val.get("email", "") or ""
+                result[uname] = {"password": pw, "email": em}
+    else:
+        # Old structure: {users: {username: {password, email}}}
+        raw = data.get("users", {}) if isinstance(data, dict) else {}
+        for uname, val in raw.items():
+            if isinstance(val, str):
+                result[uname] = {"password": val, "email": ""}
+            elif isinstance(val, dict):
+                pw = val.get("password", "") or ""
+                em = val.get("email", "") or ""
+                result[uname] = {"password": pw, "email": em}
+    
+    return result
+
+
 def save_user(username: str, password_hash: str, email: str) -> bool:
     """Add/update a user in users.json; returns True on success."""
     path = ui_path("users.json")
@@ -242,6 +270,7 @@ def save_user(username: str, password_hash: str, email: str) -> bool:
     users_obj = data.get("users", {}) if isinstance(data, dict) else {}
     users_obj[username] = {"password": password_hash, "email": email}
     data["users"] = users_obj
+    _file_cache.pop(path, None)
     try:
         with open(path, "w", encoding="utf-8") as f:
             json.dump(data, f, indent=2)
@@ -252,15 +281,14 @@ def save_user(username: str, password_hash: str, email: str) -> bool:
 
 
 def get_lockout_duration() -> int:
-    if os.path.exists(LOCKOUT_DURATION_FILE):
-        try:
-            return int(open(LOCKOUT_DURATION_FILE).read())
-        except Exception:
-            pass
-    return DEFAULT_LOCKOUT_DURATION
+    try:
+        return _cached_load(LOCKOUT_DURATION_FILE, _read_int)
+    except Exception:
+        return DEFAULT_LOCKOUT_DURATION
 
 
 def set_lockout_duration(duration: int) -> None:
+    _file_cache.pop(LOCKOUT_DURATION_FILE, None)
     with open(LOCKOUT_DURATION_FILE, "w") as f:
         f.write(str(duration))
 
@@ -318,15 +346,14 @@ def update_countdown():
 
 
 def load_failed_attempts() -> int:
-    if os.path.exists(FAILED_ATTEMPTS_FILE):
-        try:
-            return int(open(FAILED_ATTEMPTS_FILE).read())
-        except Exception:
-            return 0
-    return 0
+    try:
+        return _cached_load(FAILED_ATTEMPTS_FILE, _read_int)
+    except Exception:
+        return 0
 
 
 def save_failed_attempts(value: int) -> None:
+    _file_cache.pop(FAILED_ATTEMPTS_FILE, None)
     with open(FAILED_ATTEMPTS_FILE, "w") as f:
         f.write(str(value))
 
@@ -343,6 +370,7 @@ def write_login_history(username: str, action: str) -> None:
 
 
 def save_remembered_login(username: str, email: str | None = None):
+    _file_cache.pop(REMEMBER_FILE, None)
     try:
         data = {"username": username, "email": email} if email else {"username": username}
         with open(REMEMBER_FILE, "w", encoding="utf-8") as f:
@@ -353,16 +381,17 @@ def save_remembered_login(username: str, email: str | None = None):
 
 def load_remembered_login() -> Tuple[str, str]:
     try:
-        if os.path.exists(REMEMBER_FILE):
-            with open(REMEMBER_FILE, "r", encoding="utf-8") as f:
-                data = json.load(f)
-            return data.get("username", ""), data.get("email", "")
+        data = _cached_load(REMEMBER_FILE, _read_json)
+        return data.get("username", ""), data.get("email", "")
+    except FileNotFoundError:
+        pass
     except Exception as e:
         print("Warning: couldn't load remembered login:", e)
     return "", ""
 
 
 def clear_remembered_login():
+    _file_cache.pop(REMEMBER_FILE, None)
     try:
         if os.path.exists(REMEMBER_FILE):
             os.remove(REMEMBER_FILE)
@@ -376,26 +405,23 @@ welcome_win = None  # keep a reference so it isn't GC'd
 
 
 def _password_matches(stored: str, typed: str) -> bool:
-    """Accept legacy plain or sha256-hash matches (non-breaking)."""
-    typed_hash = hashlib.sha256(typed.encode("utf-8")).hexdigest()
-    return stored == typed or stored == typed_hash
+    """Accept scrypt hashes plus legacy plain or sha256-hash matches (non-breaking)."""
+    return verify_password(stored, typed)
 
 
 # Add new constant for per-user tracking
 USER_ATTEMPTS_FILE = "user_attempts.json"
 
 def load_user_attempts() -> dict:
-    """Load per-user failed attempts."""
-    if os.path.exists(USER_ATTEMPTS_FILE):
-        try:
-            with open(USER_ATTEMPTS_FILE, "r") as f:
-                return json.load(f)
-        except:
-            return {}
-    return {}
+    """Load per-user failed attempts (a copy, so callers can modify it)."""
+    try:
+        return dict(_cached_load(USER_ATTEMPTS_FILE, _read_json))
+    except Exception:
+        return {}
 
 def save_user_attempts(attempts: dict) -> None:
     """Save per-user failed attempts."""
+    _file_cache.pop(USER_ATTEMPTS_FILE, None)
     with open(USER_ATTEMPTS_FILE, "w") as f:
         json.dump(attempts, f)
 
@@ -431,6 +457,9 @@ def handle_login(triggered_by_button=False, triggered_by_password_enter=False):
             QtWidgets.QMessageBox.warning(window, "Input Error", "Please fill in all fields.")
         return
 
+    user_module = _user_module()
+    user_manager = user_module.user_manager if user_module else None
+    
     # First check if username exists
     username_exists = False
     actual_username = username
@@ -470,7 +499,7 @@ def handle_login(triggered_by_button=False, triggered_by_password_enter=False):
     # Now validate password for existing user
     login_valid = False
     if user_manager:
-        login_valid, returned_username = validate_user_credentials_case_insensitive(username, password)
+        login_valid, returned_username = user_module.validate_user_credentials_case_insensitive(username, password)
         if login_valid:
             actual_username = returned_username
     else:
@@ -510,11 +539,13 @@ def handle_login(triggered_by_button=False, triggered_by_password_enter=False):
     reset_user_attempts(actual_username)
     
     # Check email verification (use actual_username for consistency)
-    if verification_manager and not is_verified(actual_username):
+    verification = _optional_import("email_verification", "email_verification not found, email verification disabled")
+    popup = _optional_import("verification_popup", "verification_popup not found, email verification disabled") if verification else None
+    if popup and not verification.is_verified(actual_username):
         print(f"DEBUG: User {actual_username} is not verified")
         
         # Get user's email
-        user_email = get_user_email(actual_username)
+        user_email = popup.get_user_email(actual_username)
         if not user_email:
             QtWidgets.QMessageBox.critical(
                 window, 
@@ -525,7 +556,7 @@ def handle_login(triggered_by_button=False, triggered_by_password_enter=False):
             return
         
         # Show verification popup
-        verification_sent = show_verification_popup(window, actual_username, user_email)
+        verification_sent = popup.show_verification_popup(window, actual_username, user_email)
         
         if verification_sent:
             print(f"DEBUG: Verification email sent to {user_email}")
@@ -556,17 +587,18 @@ def handle_login(triggered_by_button=False, triggered_by_password_enter=False):
     write_login_history(actual_username, "Logged in")
 
     # Create session for the user
-    if session_manager:
+    sessions = _session_module()
+    if sessions:
         try:
-            session_token = create_session(actual_username, 3600)  # 1 hour session
+            session_token = sessions.create_session(actual_username, 3600)  # 1 hour session
             print(f"DEBUG: Created session for {actual_username}")
             
             # Save remember me if checked
             if hasattr(window, "RememberMe") and window.RememberMe.isChecked():
-                save_remember_me(actual_username, session_token)
+                sessions.save_remember_me(actual_username, session_token)
                 print(f"DEBUG: Saved remember me for {actual_username}")
             else:
-                clear_remember_me()
+                sessions.clear_remember_me()
                 print(f"DEBUG: Cleared remember me data")
         except Exception as e:
             print(f"Warning: Failed to create session: {e}")
@@ -575,11 +607,12 @@ def handle_login(triggered_by_button=False, triggered_by_password_enter=False):
     window.hide()
     
     print("DEBUG: Creating WelcomeWindow")
+    from welcome import WelcomeWindow
     welcome_win = WelcomeWindow(actual_username)
     welcome_win.resize(800, 600)
     
     # Set session token if available
-    if session_manager and 'session_token' in locals():
+    if sessions and 'session_token' in locals():
         welcome_win.set_session_token(session_token)
 
     def _on_logout():
@@ -591,9 +624,9 @@ def handle_login(triggered_by_button=False, triggered_by_password_enter=False):
             return
         
         # End session
-        if session_manager:
+        if sessions:
             try:
-                end_session(actual_username)
+                sessions.end_session(actual_username)
                 print(f"DEBUG: Ended session for {actual_username}")
             except Exception as e:
                 print(f"Warning: Failed to end session: {e}")
@@ -632,13 +665,14 @@ def handle_login(triggered_by_button=False, triggered_by_password_enter=False):
 
 def _handle_forgot_password(parent):
     """Handle forgot password request"""
-    if show_forgot_password_dialog is None:
+    reset = _optional_import("forgot_password_dialog", "password reset modules not found, forgot password disabled")
+    if reset is None:
         QtWidgets.QMessageBox.critical(parent, "Feature Unavailable", 
                                      "Password reset feature is not available.")
         return
     
     # Show forgot password dialog
-    result = show_forgot_password_dialog(parent)
+    result = reset.show_forgot_password_dialog(parent)
     
     if result == QtWidgets.QDialog.DialogCode.Accepted:
         # Optionally show reset password dialog if user wants to reset immediately
@@ -666,12 +700,15 @@ if hasattr(window, "Password"):
 
 
 def open_signup_dialog():
+    from signup import SignupDialog
     dialog = SignupDialog(window)
     
     def handle_signup(username: str, password_hash: str, email: str):
         global users
         
         # Use hybrid user manager for signup
+        user_module = _user_module()
+        user_manager = user_module.user_manager if user_module else None
         if user_manager:
             # Check if user already exists (case-insensitive)
             existing_user = user_manager.get_user_case_insensitive(username)
@@ -766,18 +803,20 @@ else:
 
 # ---- Auto-login from session ----
 auto_login_user = None
-if session_manager:
+sessions = _session_module()
+if sessions:
     try:
-        auto_login_user = auto_login_from_remember()
+        auto_login_user = sessions.auto_login_from_remember()
         if auto_login_user:
             print(f"DEBUG: Auto-login successful for {auto_login_user}")
             # Skip showing login window, go directly to welcome
+            from welcome import WelcomeWindow
             welcome_win = WelcomeWindow(auto_login_user)
             welcome_win.resize(800, 600)
             
             # Set session token for auto-login
-            if session_manager:
-                session_info = session_manager.get_session_info(auto_login_user)
+            if sessions:
+                session_info = sessions.session_manager.get_session_info(auto_login_user)
                 if session_info:
                     welcome_win.set_session_token(session_info.get("token"))
             
@@ -789,9 +828,9 @@ if session_manager:
                     return
                 
                 # End session
-                if session_manager:
+                if sessions:
                     try:
-                        end_session(auto_login_user)
+                        sessions.end_session(auto_login_user)
                         print(f"DEBUG: Ended auto-login session for {auto_login_user}")
                     except Exception as e:
                         print(f"Warning: Failed to end auto-login session: {e}")
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Password Hashing
+Argon2id password hashes (salted scrypt when argon2-cffi is not installed) with
+fallback checks for legacy SHA-256 and plain entries
+"""
+
+import hashlib
+import hmac
+import os
+import string
+import unicodedata
+
+# Prefer argon2-cffi; fall back to the stdlib scrypt hasher below
+try:
+    from argon2 import PasswordHasher
+    from argon2.exceptions import InvalidHashError, VerificationError
+    _ARGON2 = PasswordHasher()
+except ImportError:
+    _ARGON2 = None
+
+# scrypt cost parameters (~16 MB memory, tens of milliseconds per hash)
+SCRYPT_N = 2 ** 14
+SCRYPT_R = 8
+SCRYPT_P = 1
+SCRYPT_SALT_BYTES = 16
+
+SCRYPT_PREFIX = "scrypt$"
+ARGON2_PREFIX = "$argon2"
+
+_HEX_DIGITS = frozenset(string.hexdigits)
+
+
+def _is_sha256_hex(stored: str) -> bool:
+    """True if a stored value looks like a legacy unsalted SHA-256 hex digest"""
+    return len(stored) == 64 and _HEX_DIGITS.issuperset(stored)
+
+
+def _password_bytes(password: str) -> bytes:
+    """Encode a password once, in NFC form so equivalent Unicode input hashes identically"""
+    if password.isascii():
+        return password.encode("ascii")
+    return unicodedata.normalize("NFC", password).encode("utf-8")
+
+
+def _verify_modern(stored: str, password_bytes: bytes) -> bool:
+    """Check encoded password bytes against an Argon2 or scrypt hash"""
+    if stored.startswith(ARGON2_PREFIX):
+        if _ARGON2 is None:
+            return False
+        try:
+            return _ARGON2.verify(stored, password_bytes)
+        except (VerificationError, InvalidHashError):
+            return False
+
+    try:
+        n, r, p, salt_hex, digest_hex = stored[len(SCRYPT_PREFIX):].split("$")
+        digest = hashlib.scrypt(password_bytes, salt=bytes.fromhex(salt_hex),
+                                n=int(n), r=int(r), p=int(p))
+    except ValueError:
+        return False
+    return hmac.compare_digest(digest.hex(), digest_hex)
+
+
+def hash_password(password: str) -> str:
+    """
+    Hash a password with Argon2id, or scrypt and a random salt without argon2-cffi
+
+    Returns:
+        str: "$argon2id$..." or "scrypt$n$r$p$<salt hex>$<hash hex>"
+    """
+    password_bytes = _password_bytes(password)
+    if _ARGON2 is not None:
+        return _ARGON2.hash(password_bytes)
+
+    salt = os.urandom(SCRYPT_SALT_BYTES)
+    digest = hashlib.scrypt(password_bytes, salt=salt, n=SCRYPT_N, r=SCRYPT_R, p=SCRYPT_P)
+    return f"{SCRYPT_PREFIX}{SCRYPT_N}${SCRYPT_R}${SCRYPT_P}${salt.hex()}${digest.hex()}"
+
+
+def verify_password(stored: str, password: str, allow_plain: bool = True) -> bool:
+    """
+    Check a password against a stored hash
+
+    Accepts Argon2 and scrypt hashes from hash_password() as well as legacy
+    unsalted SHA-256 hex digests. Plain-text entries are accepted only with
+    allow_plain, and never for a value shaped like a SHA-256 digest, so the
+    digest itself can't be used as the password.
+    """
+    if not stored:
+        return False
+
+    if stored.startswith((ARGON2_PREFIX, SCRYPT_PREFIX)):
+        return _verify_modern(stored, _password_bytes(password))
+
+    raw_bytes = password.encode("utf-8")
+    if _is_sha256_hex(stored):
+        legacy_hash = hashlib.sha256(raw_bytes).hexdigest()
+        return hmac.compare_digest(stored.lower().encode("ascii"), legacy_hash.encode("ascii"))
+    return allow_plain and hmac.compare_digest(stored.encode("utf-8"), raw_bytes)
+
+
+def needs_rehash(stored: str) -> bool:
+    """True if a stored hash is a legacy format (or outdated Argon2 parameters) and should be replaced"""
+    if stored.startswith(ARGON2_PREFIX):
+        return _ARGON2 is not None and _ARGON2.check_needs_rehash(stored)
+    return not stored.startswith(SCRYPT_PREFIX)
@@ -10,13 +10,22 @@ import secrets
 import time
 from datetime import datetime, timedelta
 from typing import Optional, Dict, Any
+from store_utils import json_loads, atomic_write_json
 
 class PasswordResetManager:
     """Manages password reset tokens and operations"""
     
     def __init__(self, reset_tokens_file: str = "reset_tokens.json"):
         self.reset_tokens_file = reset_tokens_file
+        self.users_file = "users.json"
         self._ensure_reset_tokens_file()
+        
+        # users.json lookup indexes (username / lowercased email -> users.json key),
+        # rebuilt only when the file's mtime changes
+        self._users_mtime = None
+        self._users = {}
+        self._users_by_name = {}
+        self._users_by_email = {}
     
     def _ensure_reset_tokens_file(self):
         """Ensure reset_tokens.json exists"""
@@ -27,24 +36,65 @@ class PasswordResetManager:
     def _load_reset_tokens(self) -> Dict[str, Any]:
         """Load reset tokens from file"""
         try:
-            with open(self.reset_tokens_file, 'r') as f:
-                return json.load(f)
+            with open(self.reset_tokens_file, 'rb') as f:
+                return json_loads(f.read())
         except (FileNotFoundError, json.JSONDecodeError):
             return {}
     
     def _save_reset_tokens(self, tokens: Dict[str, Any]):
-        """Save reset tokens to file"""
-        with open(self.reset_tokens_file, 'w') as f:
-            json.dump(tokens, f, indent=2)
+        """Save reset tokens to file atomically (write temp file, then rename)"""
+        atomic_write_json(self.reset_tokens_file, tokens, indent=True)
     
     def _load_users(self) -> Dict[str, Any]:
         """Load users from users.json"""
         try:
-            with open("users.json", 'r') as f:
-                return json.load(f)
+            with open(self.users_file, 'rb') as f:
+                return json_loads(f.read())
         except (FileNotFoundError, json.JSONDecodeError):
             return {}
     
+    def _refresh_user_index(self):
+        """Rebuild the username/email indexes if users.json changed"""
+        try:
+            mtime = os.stat(self.users_file).st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        if mtime == self._users_mtime and mtime is not None:
+            return
+        
+        users = self._load_users()
+        by_name = {}
+        by_email = {}
+        for user_id, user_data in users.items():
+            # setdefault keeps the first match, like the linear scan this replaces
+            if user_data.get('username'):
+                by_name.setdefault(user_data['username'], user_id)
+            if user_data.get('email'):
+                by_email.setdefault(user_data['email'].lower(), user_id)
+        
+        self._users_mtime = mtime
+        self._users = users
+        self._users_by_name = by_name
+        self._users_by_email = by_email
+    
+    def find_user(self, username_or_email: str) -> Optional[Dict[str, Any]]:
+        """
+        Find a user by username or email address
+        
+        Args:
+            username_or_email: Username or email address (email match is case-insensitive)
+            
+        Returns:
+            A copy of the user data if found, None otherwise
+        """
+        self._refresh_user_index()
+        user_id = self._users_by_name.get(username_or_email)
+        if user_id is None:
+            user_id = self._users_by_email.get(username_or_email.lower())
+        if user_id is None:
+            return None
+        return dict(self._users[user_id])
+    
     def generate_reset_token(self, username_or_email: str, expiry_hours: int = 1) -> Optional[str]:
         """
         Generate a reset token for username or email
@@ -56,15 +106,8 @@ class PasswordResetManager:
         Returns:
             Reset token if user exists, None otherwise
         """
-        users = self._load_users()
-        
         # Find user by username or email
-        user = None
-        for user_data in users.values():
-            if (user_data.get('username') == username_or_email or 
-                user_data.get('email') == username_or_email):
-                user = user_data
-                break
+        user = self.find_user(username_or_email)
         
         if not user:
             return None
@@ -134,50 +177,60 @@ class PasswordResetManager:
         if not token_data:
             return False
         
-        # Load users
+        # Find user and update password
+        self._refresh_user_index()
+        user_id = self._users_by_name.get(token_data['username'])
+        if user_id is None:
+            return False
+        
+        # Hash new password
+        import hashlib
+        hashed_password = hashlib.sha256(new_password.encode()).hexdigest()
+        
+        # Update password on a fresh copy of users.json
         users = self._load_users()
-        username = token_data['username']
+        if user_id not in users:
+            return False
+        users[user_id]['password'] = hashed_password
         
-        # Find user and update password
-        for user_id, user_data in users.items():
-            if user_data.get('username') == username:
-                # Hash new password
-                import hashlib
-                hashed_password = hashlib.sha256(new_password.encode()).hexdigest()
-                
-                # Update password
-                users[user_id]['password'] = hashed_password
-                
-                # Save users
-                with open("users.json", 'w') as f:
-                    json.dump(users, f, indent=2)
-                
-                # Remove used token
-                tokens = self._load_reset_tokens()
-                if token in tokens:
-                    del tokens[token]
-                    self._save_reset_tokens(tokens)
-                
-                return True
+        # Save users
+        with open(self.users_file, 'w') as f:
+            json.dump(users, f, indent=2)
         
-        return False
+        # Remove used token
+        tokens = self._load_reset_tokens()
+        if token in tokens:
+            del tokens[token]
+            self._save_reset_tokens(tokens)
+        
+        return True
     
-    def cleanup_expired_tokens(self):
-        """Remove expired tokens from storage"""
+    def cleanup_expired_tokens(self, limit: Optional[int] = None) -> int:
+        """
+        Remove expired tokens from storage in a single rewrite
+        
+        Args:
+            limit: Maximum number of expired tokens to remove this run (default: all)
+            
+        Returns:
+            Number of tokens removed
+        """
         tokens = self._load_reset_tokens()
         current_time = int(time.time())
         
-        expired_tokens = [
-            token for token, data in tokens.items()
-            if current_time > data['expiry']
-        ]
+        removed = 0
+        kept = {}
+        for token, data in tokens.items():
+            if current_time > data['expiry'] and (limit is None or removed < limit):
+                removed += 1
+            else:
+                kept[token] = data
         
-        for token in expired_tokens:
-            del tokens[token]
+        if removed:
+            self._save_reset_tokens(kept)
+            print(f"Cleaned up {removed} expired tokens")
         
-        if expired_tokens:
-            self._save_reset_tokens(tokens)
-            print(f"Cleaned up {len(expired_tokens)} expired tokens")
+        return removed
     
     def get_token_info(self, token: str) -> Optional[Dict[str, Any]]:
         """Get information about a token without validating expiry"""
@@ -201,6 +254,10 @@ def generate_reset_token(username_or_email: str, expiry_hours: int = 1) -> Optio
     """Generate a reset token for username or email"""
     return reset_manager.generate_reset_token(username_or_email, expiry_hours)
 
+def find_user(username_or_email: str) -> Optional[Dict[str, Any]]:
+    """Find a user by username or email address"""
+    return reset_manager.find_user(username_or_email)
+
 def validate_reset_token(token: str) -> Optional[Dict[str, Any]]:
     """Validate a reset token"""
     return reset_manager.validate_reset_token(token)
@@ -209,9 +266,9 @@ def reset_password(token: str, new_password: str) -> bool:
     """Reset password using token"""
     return reset_manager.reset_password(token, new_password)
 
-def cleanup_expired_tokens():
+def cleanup_expired_tokens(limit: Optional[int] = None) -> int:
     """Clean up expired tokens"""
-    reset_manager.cleanup_expired_tokens()
+    return reset_manager.cleanup_expired_tokens(limit)
 
 def send_reset_email_simulation(username: str, email: str, token: str):
     """
@@ -1,5 +1,6 @@
 import os, re, hashlib, json
-from PyQt6 import QtWidgets, uic, QtCore, QtGui
+from PyQt6 import QtWidgets, QtCore, QtGui
+from ui_loader import load_ui
 
 # Import email verification
 try:
@@ -29,7 +30,7 @@ class SignupDialog(QtWidgets.QDialog):
     def _load_ui(self):
         try:
             ui_path = os.path.join(os.path.dirname(__file__), "Signup.ui")
-            uic.loadUi(ui_path, self)
+            load_ui(ui_path, self)
             self.setWindowTitle("Create Account")
         except Exception as e:
             raise RuntimeError(f"Failed to load Signup.ui: {e}")
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Store Utilities
+Helpers shared by the managers and tools that keep data in JSON files,
+with MySQL as the primary store where available
+"""
+
+import json
+import os
+import time
+
+# Prefer orjson for (de)serialization; fall back to the stdlib encoder
+try:
+    import orjson
+
+    def json_loads(data):
+        return orjson.loads(data)
+
+    def json_dumps(obj, indent: bool = False) -> bytes:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else None)
+except ImportError:
+    def json_loads(data):
+        # The stdlib parser does not accept memoryview (used for mmap'd files)
+        return json.loads(bytes(data) if isinstance(data, memoryview) else data)
+
+    def json_dumps(obj, indent: bool = False) -> bytes:
+        if indent:
+            return json.dumps(obj, indent=2).encode("utf-8")
+        return json.dumps(obj, separators=(",", ":")).encode("utf-8")
+
+
+def atomic_write_json(path: str, obj, indent: bool = False):
+    """Write obj as JSON to a temp file with raw os.write, fsync it, then rename it over path"""
+    tmp_path = path + ".tmp"
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    try:
+        view = memoryview(json_dumps(obj, indent))
+        while view:
+            written = os.write(fd, view)
+            view = view[written:]
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+    os.replace(tmp_path, path)
+
+
+# Database availability is re-probed at most this often (seconds)
+DB_AVAIL_TTL = 0.5
+_DB_AVAIL_CACHE = (0.0, False)
+
+
+def db_up() -> bool:
+    """Return is_database_available(), cached for DB_AVAIL_TTL seconds across all managers"""
+    # Imported here so JSON-only modules can use the helpers above without loading the DB driver
+    from database_manager import is_database_available
+
+    global _DB_AVAIL_CACHE
+    checked_at, available = _DB_AVAIL_CACHE
+    now = time.monotonic()
+    if checked_at and now - checked_at < DB_AVAIL_TTL:
+        return available
+    available = is_database_available()
+    _DB_AVAIL_CACHE = (now, available)
+    return available
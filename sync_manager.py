@@ -82,6 +82,20 @@ class SyncManager:
         synced_keys = set(self.sync_tracking.get(data_type, {}).keys())
         return {k: v for k, v in json_data.items() if k not in synced_keys}
     
+    def _lookup_user_email(self, username: str) -> str:
+        """Email of a user from the database, else users.json ("" if unknown)"""
+        result = execute_database_query(
+            "SELECT email FROM users WHERE username = %s", (username,), fetch=True
+        )
+        if result:
+            return result[0]["email"]
+        try:
+            with open("users.json", 'r') as f:
+                users = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return ""
+        return users.get(username, {}).get("email", "")
+    
     def check_and_sync(self) -> bool:
         """Check database availability and sync if needed"""
         current_db_status = is_database_available()
@@ -296,10 +310,15 @@ class SyncManager:
                         updated_at = CURRENT_TIMESTAMP
                     """
                     
+                    # EmailVerificationManager entries keep only the token hash and no
+                    # email; the database lookups match either form of the token
+                    email = token_data.get("email") or self._lookup_user_email(username)
+                    token = token_data.get("token") or token_data["token_hash"]
+                    
                     result = execute_database_query(
                         query, 
-                        (username, token_data["email"], token_data["token"], 
-                         token_data["expiry"], token_data["verified"])
+                        (username, email, token, 
+                         token_data["expiry"], token_data.get("verified", False))
                     )
                     
                     if result:
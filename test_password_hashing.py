@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Test Password Hashing
+Test hashing, verification and rehash detection in password_hashing
+"""
+
+import hashlib
+import password_hashing
+from password_hashing import hash_password, verify_password, needs_rehash
+
+TEST_PASSWORD = "correct horse battery staple"
+WRONG_PASSWORD = "Correct horse battery staple"
+
+def _check(label: str, passed: bool) -> bool:
+    """Print one check result and return it"""
+    print(f"   {'✅' if passed else '❌'} {label}")
+    return passed
+
+def test_scrypt_round_trip():
+    """Hash and verify with the stdlib scrypt hasher"""
+    print("\n1. scrypt hash/verify round trip")
+    saved_argon2 = password_hashing._ARGON2
+    password_hashing._ARGON2 = None  # Force the scrypt path even when argon2-cffi is installed
+    try:
+        stored = hash_password(TEST_PASSWORD)
+        results = [
+            _check("hash uses the scrypt format", stored.startswith(password_hashing.SCRYPT_PREFIX)),
+            _check("correct password verifies", verify_password(stored, TEST_PASSWORD)),
+            _check("wrong password is rejected", not verify_password(stored, WRONG_PASSWORD)),
+            _check("hashes are salted", hash_password(TEST_PASSWORD) != stored),
+            _check("NFC and NFD forms of a password match",
+                   verify_password(hash_password("caf\u00e9"), "cafe\u0301")),
+        ]
+    finally:
+        password_hashing._ARGON2 = saved_argon2
+    assert all(results)
+
+def test_argon2_round_trip():
+    """Hash and verify with Argon2id (skipped without argon2-cffi)"""
+    print("\n2. Argon2 hash/verify round trip")
+    if password_hashing._ARGON2 is None:
+        print("   ⏭️ argon2-cffi not installed, skipped")
+        return
+
+    stored = hash_password(TEST_PASSWORD)
+    results = [
+        _check("hash uses the Argon2 format", stored.startswith(password_hashing.ARGON2_PREFIX)),
+        _check("correct password verifies", verify_password(stored, TEST_PASSWORD)),
+        _check("wrong password is rejected", not verify_password(stored, WRONG_PASSWORD)),
+        _check("fresh hash does not need a rehash", not needs_rehash(stored)),
+    ]
+    assert all(results)
+
+def test_legacy_sha256():
+    """Legacy unsalted SHA-256 digests are accepted, but the digest is not a password"""
+    print("\n3. Legacy SHA-256 digests")
+    legacy = hashlib.sha256(TEST_PASSWORD.encode("utf-8")).hexdigest()
+    results = [
+        _check("correct password verifies", verify_password(legacy, TEST_PASSWORD)),
+        _check("upper-case digest verifies", verify_password(legacy.upper(), TEST_PASSWORD)),
+        _check("wrong password is rejected", not verify_password(legacy, WRONG_PASSWORD)),
+        _check("the digest typed as the password is rejected", not verify_password(legacy, legacy)),
+        _check("... also with allow_plain=False", not verify_password(legacy, legacy, allow_plain=False)),
+    ]
+    assert all(results)
+
+def test_plain_text_entries():
+    """Plain-text entries only match when allow_plain is set"""
+    print("\n4. Plain-text entries")
+    results = [
+        _check("accepted with allow_plain=True", verify_password(TEST_PASSWORD, TEST_PASSWORD)),
+        _check("rejected with allow_plain=False",
+               not verify_password(TEST_PASSWORD, TEST_PASSWORD, allow_plain=False)),
+        _check("wrong password is rejected", not verify_password(TEST_PASSWORD, WRONG_PASSWORD)),
+        _check("empty stored value never matches", not verify_password("", "")),
+    ]
+    assert all(results)
+
+def test_needs_rehash():
+    """Legacy formats need a rehash, current hashes don't"""
+    print("\n5. needs_rehash")
+    legacy = hashlib.sha256(TEST_PASSWORD.encode("utf-8")).hexdigest()
+    saved_argon2 = password_hashing._ARGON2
+    password_hashing._ARGON2 = None
+    try:
+        scrypt_hash = hash_password(TEST_PASSWORD)
+    finally:
+        password_hashing._ARGON2 = saved_argon2
+    results = [
+        _check("SHA-256 digest needs a rehash", needs_rehash(legacy)),
+        _check("plain-text entry needs a rehash", needs_rehash(TEST_PASSWORD)),
+        _check("scrypt hash does not need a rehash", not needs_rehash(scrypt_hash)),
+    ]
+    assert all(results)
+
+def main():
+    """Main test function"""
+    print("=" * 70)
+    print("PASSWORD HASHING TEST")
+    print("=" * 70)
+
+    tests = [
+        test_scrypt_round_trip,
+        test_argon2_round_trip,
+        test_legacy_sha256,
+        test_plain_text_entries,
+        test_needs_rehash,
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+        except AssertionError:
+            failed += 1
+
+    print("\n" + "=" * 70)
+    if failed:
+        print(f"❌ {failed} of {len(tests)} password hashing tests failed")
+    else:
+        print("🎉 ALL PASSWORD HASHING TESTS PASSED!")
+    return failed == 0
+
+if __name__ == "__main__":
+    raise SystemExit(0 if main() else 1)
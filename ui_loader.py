@@ -0,0 +1,36 @@
+"""
+Cached .ui Loading
+Drop-in replacement for uic.loadUi that compiles each Designer file only once
+"""
+
+import functools
+import os
+from typing import Optional
+
+from PyQt6 import QtWidgets, uic
+
+
+@functools.lru_cache(maxsize=32)
+def _compiled_ui(path: str, mtime_ns: int) -> tuple:
+    """(form_class, base_class) for a .ui file; cached per (path, mtime) so editing the file recompiles it"""
+    return uic.loadUiType(path)
+
+
+def load_ui(path: str, baseinstance: Optional[QtWidgets.QWidget] = None) -> QtWidgets.QWidget:
+    """
+    Build a .ui file into baseinstance, like uic.loadUi(path, baseinstance)
+
+    The XML is parsed and compiled on the first call only; later windows
+    reuse the generated form class. If baseinstance is None, an instance of
+    the file's top-level widget class is created. Child widgets become
+    attributes of the widget, and on_<name>_<signal> slots are connected.
+    """
+    form_class, base_class = _compiled_ui(path, os.stat(path).st_mtime_ns)
+    widget = baseinstance if baseinstance is not None else base_class()
+
+    form = form_class()
+    form.setupUi(widget)
+    # setupUi stores the children on the form object; uic.loadUi puts them on the widget
+    for name, child in vars(form).items():
+        setattr(widget, name, child)
+    return widget
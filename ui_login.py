@@ -0,0 +1,94 @@
+# Form implementation generated from reading ui file 'Login.ui'
+#
+# Regenerate with: pyuic6 Login.ui -o ui_login.py
+#
+# WARNING: Any manual changes made to this file will be lost when pyuic6 is
+# run again.  Do not edit this file unless you know what you are doing.
+
+
+from PyQt6 import QtCore, QtGui, QtWidgets
+
+
+class Ui_Dialog(object):
+    def setupUi(self, Dialog):
+        Dialog.setObjectName("Dialog")
+        Dialog.resize(1002, 569)
+        Dialog.setMouseTracking(False)
+        Dialog.setStyleSheet("QDialog {\n"
+"    background-color: #3C3C3C;  /* light gray */\n"
+"}")
+        self.Username = QtWidgets.QLineEdit(parent=Dialog)
+        self.Username.setGeometry(QtCore.QRect(300, 110, 381, 31))
+        self.Username.setEchoMode(QtWidgets.QLineEdit.EchoMode.Normal)
+        self.Username.setObjectName("Username")
+        self.label = QtWidgets.QLabel(parent=Dialog)
+        self.label.setGeometry(QtCore.QRect(300, 70, 191, 41))
+        font = QtGui.QFont()
+        font.setFamily("Sans Serif Collection")
+        font.setPointSize(16)
+        self.label.setFont(font)
+        self.label.setObjectName("label")
+        self.RememberMe = QtWidgets.QCheckBox(parent=Dialog)
+        self.RememberMe.setGeometry(QtCore.QRect(300, 320, 101, 20))
+        self.RememberMe.setObjectName("RememberMe")
+        self.label_2 = QtWidgets.QLabel(parent=Dialog)
+        self.label_2.setGeometry(QtCore.QRect(300, 190, 191, 41))
+        font = QtGui.QFont()
+        font.setFamily("Sans Serif Collection")
+        font.setPointSize(16)
+        self.label_2.setFont(font)
+        self.label_2.setObjectName("label_2")
+        self.Login = QtWidgets.QPushButton(parent=Dialog)
+        self.Login.setGeometry(QtCore.QRect(410, 490, 251, 61))
+        font = QtGui.QFont()
+        font.setPointSize(16)
+        self.Login.setFont(font)
+        self.Login.setAutoDefault(False)
+        self.Login.setObjectName("Login")
+        self.ForgotPassword = QtWidgets.QLabel(parent=Dialog)
+        self.ForgotPassword.setGeometry(QtCore.QRect(300, 370, 121, 31))
+        font = QtGui.QFont()
+        font.setPointSize(12)
+        font.setItalic(True)
+        font.setUnderline(False)
+        self.ForgotPassword.setFont(font)
+        self.ForgotPassword.setMouseTracking(True)
+        self.ForgotPassword.setObjectName("ForgotPassword")
+        self.Password = QtWidgets.QLineEdit(parent=Dialog)
+        self.Password.setGeometry(QtCore.QRect(300, 230, 381, 31))
+        self.Password.setEchoMode(QtWidgets.QLineEdit.EchoMode.Password)
+        self.Password.setObjectName("Password")
+        self.signupLink = QtWidgets.QLabel(parent=Dialog)
+        self.signupLink.setGeometry(QtCore.QRect(98, 460, 191, 61))
+        self.signupLink.setObjectName("signupLink")
+        self.TogglePassword = QtWidgets.QPushButton(parent=Dialog)
+        self.TogglePassword.setGeometry(QtCore.QRect(680, 230, 51, 31))
+        self.TogglePassword.setStyleSheet("QPushButton {\n"
+"    background: transparent;\n"
+"    border: none;\n"
+"}")
+        self.TogglePassword.setText("")
+        self.TogglePassword.setIconSize(QtCore.QSize(25, 25))
+        self.TogglePassword.setAutoDefault(False)
+        self.TogglePassword.setObjectName("TogglePassword")
+        self.dbstrength = QtWidgets.QPushButton(parent=Dialog)
+        self.dbstrength.setGeometry(QtCore.QRect(810, 0, 71, 41))
+        self.dbstrength.setStyleSheet("QPushButton {\n"
+"    background: transparent;\n"
+"    border: none;\n"
+"}")
+        self.dbstrength.setText("")
+        self.dbstrength.setObjectName("dbstrength")
+
+        self.retranslateUi(Dialog)
+        QtCore.QMetaObject.connectSlotsByName(Dialog)
+
+    def retranslateUi(self, Dialog):
+        _translate = QtCore.QCoreApplication.translate
+        Dialog.setWindowTitle(_translate("Dialog", "Dialog"))
+        self.label.setText(_translate("Dialog", "Username"))
+        self.RememberMe.setText(_translate("Dialog", "Remember me"))
+        self.label_2.setText(_translate("Dialog", "Password"))
+        self.Login.setText(_translate("Dialog", "Login"))
+        self.ForgotPassword.setText(_translate("Dialog", "ForgotPassword"))
+        self.signupLink.setText(_translate("Dialog", "Dont have an account? Sign Up"))
@@ -190,10 +190,9 @@ def demo_verification_file_structure():
     print(f"\n1. Created verification for '{username}'")
     print(f"   Token: {token[:16]}...")
     
-    # Read and display the verification.json file
+    # Read and display the verification data through the manager's cache
     try:
-        with open("verification.json", "r", encoding="utf-8") as f:
-            data = json.load(f)
+        data = verification_manager._load_verifications()
         
         print(f"\n2. verification.json file structure:")
         print(json.dumps(data, indent=2))
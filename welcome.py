@@ -1,5 +1,6 @@
-from PyQt6 import QtWidgets, uic, QtCore
+from PyQt6 import QtWidgets, QtCore
 import os
+from ui_loader import load_ui
 
 # Import session management
 try:
@@ -19,7 +20,7 @@ class WelcomeWindow(QtWidgets.QMainWindow):
         # Load UI with fallback
         try:
             ui_path = os.path.join(os.path.dirname(__file__), "welcome.ui")
-            uic.loadUi(ui_path, self)
+            load_ui(ui_path, self)
             # Set exact size from Designer
             self.resize(991, 621)
         except Exception as e: